@@ -0,0 +1,75 @@
+"""
+Compare per-object ``url_for`` calls with the URL templates used by
+:mod:`flask_jsonapi.link_builder`.
+
+The workload mirrors a 100 item page where each resource object has four
+relationships, i.e. 900 links per response. Run it with Flask-JSONAPI
+installed::
+
+    python benchmarks/link_builder.py
+"""
+from __future__ import print_function
+
+import timeit
+
+from flask import Flask, url_for
+
+from flask_jsonapi import link_builder
+from flask_jsonapi.views import blueprint
+
+PAGE_SIZE = 100
+RELATIONSHIPS = ('author', 'chapters', 'series', 'stores')
+REPEAT = 20
+
+
+def build_links_with_url_for():
+    for id in range(PAGE_SIZE):
+        url_for('jsonapi.fetch_one', type='books', id=id, _external=True)
+        for relationship in RELATIONSHIPS:
+            url_for(
+                'jsonapi.fetch_relationship',
+                type='books',
+                id=id,
+                relationship=relationship,
+                _external=True
+            )
+            url_for(
+                'jsonapi.fetch_related',
+                type='books',
+                id=id,
+                relationship=relationship,
+                _external=True
+            )
+
+
+def build_links_with_templates():
+    for id in range(PAGE_SIZE):
+        link_builder.build_individual_resource_url(type='books', id=id)
+        for relationship in RELATIONSHIPS:
+            link_builder.build_relationship_url(
+                type='books',
+                id=id,
+                relationship=relationship
+            )
+            link_builder.build_related_url(
+                type='books',
+                id=id,
+                relationship=relationship
+            )
+
+
+def main():
+    app = Flask(__name__)
+    app.config['SERVER_NAME'] = 'example.com'
+    app.register_blueprint(blueprint)
+    for func in (build_links_with_url_for, build_links_with_templates):
+        with app.test_request_context():
+            best = min(timeit.repeat(func, number=1, repeat=REPEAT))
+        print('{name}: {ms:.2f} ms per page'.format(
+            name=func.__name__,
+            ms=best * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
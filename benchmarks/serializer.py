@@ -0,0 +1,196 @@
+"""
+Compare serializing a compound document with and without the per-document
+identity map of :class:`flask_jsonapi.serializer.Serializer`.
+
+The workload dumps every book of the fantasy-database fixtures together
+with their authors, chapters, series and stores, loaded into an in-memory
+SQLite database. Install the fixtures with ``npm install`` and run it with
+Flask-JSONAPI installed::
+
+    python benchmarks/serializer.py
+"""
+from __future__ import print_function
+
+import json
+import os
+import timeit
+from datetime import datetime
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from flask_jsonapi import JSONAPI
+from flask_jsonapi.params import Parameters
+from flask_jsonapi.resource import Attribute, Relationship, Resource
+from flask_jsonapi.serializer import Identity, Serializer
+from flask_jsonapi.store.sqlalchemy import SQLAlchemyStore
+
+FANTASY_DATABASE_FILENAME = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'node_modules',
+    'fantasy-database',
+    'data.json'
+)
+INCLUDE = 'author,chapters,series,stores'
+REPEAT = 20
+
+
+class SerializerWithoutIdentityMap(Serializer):
+    def _get_identity(self, model):
+        resource = self.resource_registry.by_model_class[model.__class__]
+        id_ = resource.store.get_id(model)
+        return Identity(
+            model=model,
+            resource=resource,
+            id=id_,
+            identifier=(resource.type, id_)
+        )
+
+
+def create_models(db):
+    book_store = db.Table(
+        'books_stores',
+        db.Column('book_id', db.Integer, db.ForeignKey('books.id')),
+        db.Column('store_id', db.Integer, db.ForeignKey('stores.id'))
+    )
+
+    class Series(db.Model):
+        __tablename__ = 'series'
+        id = db.Column(db.Integer, primary_key=True)
+        title = db.Column(db.Text, nullable=False)
+
+    class Author(db.Model):
+        __tablename__ = 'authors'
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.Text, nullable=False)
+        date_of_birth = db.Column(db.Date, nullable=False)
+        date_of_death = db.Column(db.Date)
+
+    class Book(db.Model):
+        __tablename__ = 'books'
+        id = db.Column(db.Integer, primary_key=True)
+        author_id = db.Column(db.Integer, db.ForeignKey(Author.id))
+        author = db.relationship(Author, backref='books')
+        series_id = db.Column(db.Integer, db.ForeignKey(Series.id))
+        series = db.relationship(Series, backref='books')
+        date_published = db.Column(db.Date, nullable=False)
+        title = db.Column(db.Text)
+
+    class Chapter(db.Model):
+        __tablename__ = 'chapters'
+        id = db.Column(db.Integer, primary_key=True)
+        book_id = db.Column(db.Integer, db.ForeignKey(Book.id))
+        title = db.Column(db.Text, nullable=False)
+        ordering = db.Column(db.Integer, nullable=False)
+        book = db.relationship(
+            Book,
+            backref=db.backref('chapters', order_by=ordering)
+        )
+
+    class Store(db.Model):
+        __tablename__ = 'stores'
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.Text, nullable=False)
+        books = db.relationship(Book, secondary=book_store, backref='stores')
+
+    return Series, Author, Book, Chapter, Store
+
+
+def load_fixtures(db):
+    with open(FANTASY_DATABASE_FILENAME, 'r') as f:
+        data = json.loads(f.read())
+    db.create_all()
+    for table in db.metadata.sorted_tables:
+        rows = data[table.name]
+        for row in rows:
+            for column, value in row.items():
+                if isinstance(table.columns[column].type, db.Date) and value:
+                    row[column] = datetime.strptime(value, '%Y-%m-%d').date()
+        db.session.execute(table.insert(), rows)
+    db.session.commit()
+
+
+def register_resources(jsonapi, db, models):
+    Series, Author, Book, Chapter, Store = models
+    store = SQLAlchemyStore(db.session)
+    for resource in [
+        Resource(
+            type='series',
+            model_class=Series,
+            store=store,
+            fields=[Attribute('title'), Relationship('books')]
+        ),
+        Resource(
+            type='authors',
+            model_class=Author,
+            store=store,
+            fields=[
+                Attribute('name'),
+                Attribute('date_of_birth'),
+                Attribute('date_of_death'),
+                Relationship('books')
+            ]
+        ),
+        Resource(
+            type='books',
+            model_class=Book,
+            store=store,
+            fields=[
+                Attribute('title'),
+                Attribute('date_published'),
+                Relationship('author'),
+                Relationship('chapters', allow_include=True),
+                Relationship('series'),
+                Relationship('stores', allow_include=True)
+            ]
+        ),
+        Resource(
+            type='chapters',
+            model_class=Chapter,
+            store=store,
+            fields=[
+                Attribute('title'),
+                Attribute('ordering'),
+                Relationship('book')
+            ]
+        ),
+        Resource(
+            type='stores',
+            model_class=Store,
+            store=store,
+            fields=[Attribute('name'), Relationship('books')]
+        ),
+    ]:
+        jsonapi.resources.register(resource)
+
+
+def main():
+    app = Flask(__name__)
+    app.config['SERVER_NAME'] = 'example.com'
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db = SQLAlchemy(app)
+    jsonapi = JSONAPI(app)
+    with app.app_context():
+        models = create_models(db)
+        load_fixtures(db)
+        register_resources(jsonapi, db, models)
+        registry = jsonapi.resources
+        params = Parameters(registry, 'books', {'include': INCLUDE})
+        books = registry.by_type['books'].store.fetch(models[2], params)
+        for cls in (SerializerWithoutIdentityMap, Serializer):
+            serializer = cls(registry, params)
+            with app.test_request_context():
+                best = min(timeit.repeat(
+                    lambda: serializer.dump(books),
+                    number=1,
+                    repeat=REPEAT
+                ))
+            print('{name}: {ms:.2f} ms per document'.format(
+                name=cls.__name__,
+                ms=best * 1000
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,12 +10,16 @@ class JSONAPI(object):
         self,
         app=None,
         controller_class=DefaultController,
-        url_prefix=''
+        url_prefix='',
+        controller_options=None
     ):
         self.app = app
         self.resources = ResourceRegistry()
         self.url_prefix = url_prefix
-        self.controller = controller_class(resource_registry=self.resources)
+        self.controller = controller_class(
+            resource_registry=self.resources,
+            **(controller_options or {})
+        )
 
         if app is not None:
             self.init_app(app)
@@ -5,5 +5,7 @@ is_py3 = sys.version_info[0] > 2
 
 if is_py3:  # pragma: no cover
     string_types = str
+    text_type = str
 else:       # pragma: no cover
     string_types = basestring
+    text_type = unicode
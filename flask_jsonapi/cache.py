@@ -0,0 +1,183 @@
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import json
+
+from . import _compat
+
+
+class Cache(object):
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LocalCache(Cache):
+    def __init__(
+        self,
+        max_size=1000,
+        ttl=None,
+        max_bytes=None,
+        timer=time.time
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.timer = timer
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value, expires, size = self._items.pop(key)
+            except KeyError:
+                return None
+            if expires is not None and expires <= self.timer():
+                self.bytes -= size
+                return None
+            self._items[key] = (value, expires, size)
+            return value
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttl
+        expires = None if ttl is None else self.timer() + ttl
+        size = _get_size(value)
+        with self._lock:
+            self._pop(key)
+            self._items[key] = (value, expires, size)
+            self.bytes += size
+            while len(self._items) > self.max_size or (
+                self.max_bytes is not None and self.bytes > self.max_bytes
+            ):
+                self.bytes -= self._items.popitem(last=False)[1][2]
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def _pop(self, key):
+        try:
+            self.bytes -= self._items.pop(key)[2]
+        except KeyError:
+            pass
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ResponseCache(object):
+    def __init__(self, backend=None, ttl=None):
+        self.backend = LocalCache() if backend is None else backend
+        self.ttl = ttl
+
+    def get_epoch(self):
+        epoch = self.backend.get('response_epoch')
+        if epoch is None:
+            epoch = self._set_token('response_epoch')
+        return epoch
+
+    def get(self, key):
+        entry = self.backend.get('response:' + key)
+        if entry is None:
+            return None
+        header, body = entry.split(b'\n', 1)
+        header = json.loads(header.decode('utf8'))
+        for tag, generation in header['tags'].items():
+            if self.backend.get('response_generation:' + tag) != generation:
+                return None
+        return header['status'], body
+
+    def set(self, key, status, body, tags, epoch):
+        generations = {tag: self._get_generation(tag) for tag in tags}
+        # A document built while a write was invalidating the cache may
+        # already be stale, so it is not stored. The epoch is checked after
+        # the generations are read, as an invalidation in between would
+        # store the stale document with the new generations.
+        if self.backend.get('response_epoch') != epoch:
+            return
+        header = json.dumps({'status': status, 'tags': generations})
+        self.backend.set(
+            'response:' + key,
+            header.encode('utf8') + b'\n' + body,
+            ttl=self.ttl
+        )
+
+    def invalidate(self, tags):
+        self._set_token('response_epoch')
+        for tag in tags:
+            self._set_token('response_generation:' + tag)
+
+    def _get_generation(self, tag):
+        generation = self.backend.get('response_generation:' + tag)
+        if generation is None:
+            generation = self._set_token('response_generation:' + tag)
+        return generation
+
+    def _set_token(self, key):
+        token = uuid.uuid4().hex
+        self.backend.set(key, token)
+        return token
+
+
+class SingleFlight(object):
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                call.waiters += 1
+                leader = False
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+def _get_size(value):
+    if isinstance(value, (bytes, _compat.text_type)):
+        return len(value)
+    return sys.getsizeof(value)
@@ -1,25 +1,143 @@
+import functools
+import itertools
+
 import qstring
-from flask import abort, current_app, json, request
+from flask import abort, current_app, json, request, stream_with_context
+from werkzeug.http import generate_etag
 from werkzeug.urls import url_encode
 
-from .. import errors, exceptions, link_builder
+from .. import _compat, errors, exceptions, link_builder
+from ..cache import SingleFlight
 from ..params import Parameters
 from ..request_parser import RequestParser
 from ..serializer import Serializer
 
 
+def cached_response(method):
+    @functools.wraps(method)
+    def wrapper(self, type, *args):
+        if self.response_cache is None:
+            return method(self, type, *args)
+        return self._get_cached_response(method, type, *args)
+    return wrapper
+
+
+def coalesced_response(method):
+    @functools.wraps(method)
+    def wrapper(self, type, *args):
+        if self._single_flight is None:
+            return method(self, type, *args)
+        return self._get_coalesced_response(method, type, *args)
+    return wrapper
+
+
+def conditional_response(method):
+    @functools.wraps(method)
+    def wrapper(self, type, *args):
+        resource = self.resource_registry.by_type.get(type)
+        if resource is None or not resource.etag:
+            return method(self, type, *args)
+        return self._get_conditional_response(method, resource, *args)
+    return wrapper
+
+
 class DefaultController(object):
-    def __init__(self, resource_registry):
+    def __init__(
+        self,
+        resource_registry,
+        streaming=False,
+        batch_size=100,
+        executor=None,
+        response_cache=None,
+        coalesce=False
+    ):
         self.resource_registry = resource_registry
+        self.streaming = streaming
+        self.batch_size = batch_size
+        self.executor = executor
+        self.response_cache = response_cache
+        self._single_flight = SingleFlight() if coalesce else None
+        self._listening_version = None
+        if response_cache is not None:
+            resource_registry.register_listeners.append(self._listen_to_stores)
+            self._listen_to_stores()
 
+    @conditional_response
+    @coalesced_response
+    @cached_response
     def fetch(self, type):
         resource = self._get_resource(type)
         params = self._build_params(type)
-        instances = resource.store.fetch(resource.model_class, params)
-        count = resource.store.count(resource.model_class)
-        links = self._get_links(params, count)
-        return self._serialize(instances, params, links)
+        return self._fetch_collection(resource, params)
+
+    def _fetch_collection(self, resource, params):
+        if self.streaming:
+            get_count = self._start_count(
+                resource,
+                params,
+                resource.store.count,
+                resource.model_class
+            )
+            instances = resource.store.iter_fetch(
+                resource.model_class,
+                params,
+                batch_size=self.batch_size
+            )
+            return self._stream(
+                instances,
+                params,
+                lambda: self._get_collection_links(params, get_count()),
+                lambda: self._get_collection_meta(params, get_count())
+            )
+        if self._counts_concurrently(resource):
+            get_count = self._start_count(
+                resource,
+                params,
+                resource.store.count,
+                resource.model_class
+            )
+            instances = resource.store.fetch(resource.model_class, params)
+            count = get_count()
+        else:
+            instances, count = resource.store.fetch_with_count(
+                resource.model_class,
+                params
+            )
+        return self._serialize_collection(
+            instances,
+            params,
+            count,
+            self._get_collection_meta(params, count)
+        )
+
+    def export(self, type):
+        resource = self._get_resource(type)
+        params = self._build_params(type)
+        for name in ('include', 'page'):
+            if name in params.raw:
+                raise errors.ParameterNotAllowed(name)
+        instances = resource.store.iter_fetch_all(
+            resource.model_class,
+            params,
+            batch_size=self.batch_size
+        )
+        serializer = Serializer(self.resource_registry, params)
+
+        def generate():
+            for resource_object in serializer.iter_export(
+                instances,
+                batch_size=self.batch_size
+            ):
+                yield json.dumps(resource_object) + '\n'
+
+        return current_app.response_class(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson'
+        )
 
+    @conditional_response
+    @coalesced_response
+    @cached_response
     def fetch_one(self, type, id):
         resource = self._get_resource(type)
         params = self._build_params(type)
@@ -27,46 +145,177 @@ class DefaultController(object):
         links = self._get_links(params)
         return self._serialize(instance, params, links)
 
+    @conditional_response
+    @cached_response
     def fetch_related(self, type, id, relationship):
         resource = self._get_resource(type)
         relationship = self._get_relationship(resource, relationship)
         params = self._build_params(relationship.type)
+        return self._fetch_related(resource, id, relationship, params)
+
+    def _fetch_related(self, resource, id, relationship, params):
         instance = self._fetch_object(resource, id)
-        related = resource.store.fetch_related(
-            instance=instance,
-            relationship=relationship.name,
-            params=params
+        if not relationship.many:
+            related = resource.store.fetch_related(
+                instance=instance,
+                relationship=relationship.name,
+                params=params
+            )
+            links = self._get_links(params)
+            return self._serialize(related, params, links)
+        if self.streaming:
+            get_count = self._start_related_count(
+                resource,
+                id,
+                instance,
+                relationship,
+                params
+            )
+            related = resource.store.iter_fetch_related(
+                instance=instance,
+                relationship=relationship.name,
+                params=params,
+                batch_size=self.batch_size
+            )
+            return self._stream(
+                related,
+                params,
+                lambda: self._get_collection_links(params, get_count()),
+                lambda: self._get_count_meta(params, get_count())
+            )
+        related, count = self._fetch_related_with_count(
+            resource,
+            id,
+            instance,
+            relationship,
+            params
+        )
+        return self._serialize_collection(
+            related,
+            params,
+            count,
+            self._get_count_meta(params, count)
         )
-        if relationship.many:
-            count = resource.store.count_related(instance, relationship.name)
-        else:
-            count = None
-        links = self._get_links(params, count)
-        return self._serialize(related, params, links)
 
+    @conditional_response
+    @cached_response
     def fetch_relationship(self, type, id, relationship):
         resource = self._get_resource(type)
         relationship = self._get_relationship(resource, relationship)
         params = self._build_params(relationship.type)
+        return self._fetch_relationship(resource, id, relationship, params)
+
+    def _fetch_relationship(self, resource, id, relationship, params):
         instance = self._fetch_object(resource, id)
-        related = resource.store.fetch_related(
-            instance=instance,
-            relationship=relationship.name,
-            params=params
-        )
         if relationship.many:
-            count = resource.store.count_related(instance, relationship.name)
+            related, count = self._fetch_related_with_count(
+                resource,
+                id,
+                instance,
+                relationship,
+                params
+            )
+            links = self._get_collection_links(params, count)
         else:
-            count = None
-        links = self._get_links(params, count)
+            related = resource.store.fetch_related(
+                instance=instance,
+                relationship=relationship.name,
+                params=params
+            )
+            links = self._get_links(params)
         links['related'] = link_builder.build_related_url(
-            type=type,
+            type=resource.type,
             id=id,
             relationship=relationship.name
         )
         return self._serialize_relationship(related, params, links)
 
+    def _fetch_related_with_count(
+        self,
+        resource,
+        id,
+        instance,
+        relationship,
+        params
+    ):
+        if not self._counts_concurrently(resource):
+            return resource.store.fetch_related_with_count(
+                instance=instance,
+                relationship=relationship.name,
+                params=params
+            )
+        get_count = self._start_related_count(
+            resource,
+            id,
+            instance,
+            relationship,
+            params
+        )
+        related = resource.store.fetch_related(
+            instance=instance,
+            relationship=relationship.name,
+            params=params
+        )
+        return related, get_count()
+
+    def _start_related_count(
+        self,
+        resource,
+        id,
+        instance,
+        relationship,
+        params
+    ):
+        if not self._counts_concurrently(resource):
+            return self._start_count(
+                resource,
+                params,
+                resource.store.count_related,
+                instance,
+                relationship.name
+            )
+        # The instance belongs to the session of this thread, so the worker
+        # counts the related objects by the id of the parent.
+        return self._start_count(
+            resource,
+            params,
+            resource.store.count_related_by_id,
+            resource.model_class,
+            id,
+            relationship.name
+        )
+
+    def _start_count(self, resource, params, count, *args):
+        if not params.pagination.requires_count:
+            return lambda: None
+        if params.pagination.approximate_count:
+            count = functools.partial(count, approximate=True)
+        count = functools.partial(count, *args)
+        if not self._counts_concurrently(resource):
+            result = count()
+            return lambda: result
+        return self._submit(count).result
+
+    def _counts_concurrently(self, resource):
+        # A session must not be shared between threads, so only a store
+        # with a scoped session counts in a worker, where the session of
+        # the worker's own application context is used.
+        return (
+            self.executor is not None and
+            resource.store.has_scoped_session()
+        )
+
+    def _submit(self, function, *args):
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                return function(*args)
+
+        return self.executor.submit(run)
+
     def create(self, type):
+        self._listen_to_stores()
         resource = self._get_resource(type)
         params = self._build_params(type)
         parser = RequestParser(resource=resource)
@@ -92,7 +341,9 @@ class DefaultController(object):
         )
 
     def update(self, type, id):
+        self._listen_to_stores()
         resource = self._get_resource(type)
+        self._check_precondition(resource, id)
         params = self._build_params(type)
         instance = self._fetch_object(resource, id)
         parser = RequestParser(resource=resource, id=id)
@@ -102,7 +353,9 @@ class DefaultController(object):
         return self._serialize(instance, params, links)
 
     def delete(self, type, id):
+        self._listen_to_stores()
         resource = self._get_resource(type)
+        self._check_precondition(resource, id)
         try:
             instance = resource.store.fetch_one(resource.model_class, id)
         except exceptions.ObjectNotFound:
@@ -112,6 +365,7 @@ class DefaultController(object):
         return current_app.response_class(response='', status=204)
 
     def create_relationship(self, type, id, relationship):
+        self._listen_to_stores()
         resource = self._get_resource(type)
         relationship = self._get_relationship(resource, relationship)
         instance = self._fetch_object(resource, id)
@@ -130,6 +384,7 @@ class DefaultController(object):
         return current_app.response_class(response='', status=204)
 
     def update_relationship(self, type, id, relationship):
+        self._listen_to_stores()
         resource = self._get_resource(type)
         relationship = self._get_relationship(resource, relationship)
         instance = self._fetch_object(resource, id)
@@ -148,6 +403,7 @@ class DefaultController(object):
         return current_app.response_class(response='', status=204)
 
     def delete_relationship(self, type, id, relationship):
+        self._listen_to_stores()
         resource = self._get_resource(type)
         relationship = self._get_relationship(resource, relationship)
         instance = self._fetch_object(resource, id)
@@ -166,6 +422,155 @@ class DefaultController(object):
         )
         return current_app.response_class(response='', status=204)
 
+    def _get_cached_response(self, method, type, *args):
+        self._listen_to_stores()
+        key = self._get_request_key(method, type, args)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            status, body = cached
+            return current_app.response_class(response=body, status=status)
+        epoch = self.response_cache.get_epoch()
+        response = current_app.make_response(method(self, type, *args))
+        if response.status_code == 200 and not response.is_streamed:
+            body = response.get_data()
+            tags = self._get_document_tags(json.loads(body.decode('utf8')))
+            if method.__name__ == 'fetch':
+                tags.add(type)
+            elif args:
+                tags.add(type + ':' + args[0])
+            self.response_cache.set(key, 200, body, tags, epoch)
+        return response
+
+    def _get_conditional_response(self, method, resource, *args):
+        etag = None
+        if (
+            method.__name__ == 'fetch_one' and
+            resource.version_attribute is not None and
+            self._has_version_etag(resource, self._build_params(resource.type))
+        ):
+            etag = self._get_version_etag(resource, args[0])
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+        response = current_app.make_response(
+            method(self, resource.type, *args)
+        )
+        if response.status_code != 200 or response.is_streamed:
+            return response
+        if etag is None:
+            response.add_etag()
+        else:
+            response.set_etag(etag)
+        return response.make_conditional(request)
+
+    def _has_version_etag(self, resource, params):
+        # The version covers the resource, but not the linkage of to-many
+        # relationships or the included resources.
+        if params.include.paths:
+            return False
+        return not any(
+            relationship.many and relationship.allow_include
+            for relationship in resource.relationships.values()
+            if relationship.name in params.fields[resource.type]
+        )
+
+    def _get_version_etag(self, resource, id):
+        try:
+            version = resource.store.fetch_version(
+                resource.model_class,
+                id,
+                resource.version_attribute
+            )
+        except exceptions.ObjectNotFound:
+            raise errors.ResourceNotFound(type=resource.type, id=id)
+        return generate_etag(
+            json.dumps([resource.type, id, _compat.text_type(version)])
+            .encode('utf8')
+        )
+
+    def _check_precondition(self, resource, id):
+        if not resource.etag or not request.if_match:
+            return
+        try:
+            matches = any(
+                request.if_match.contains(etag)
+                for etag in self._iter_current_etags(resource, id)
+            )
+        except errors.ResourceNotFound:
+            matches = False
+        if not matches:
+            raise errors.PreconditionFailed()
+
+    def _iter_current_etags(self, resource, id):
+        if resource.version_attribute is not None:
+            yield self._get_version_etag(resource, id)
+        response = current_app.make_response(self.fetch_one(resource.type, id))
+        yield response.get_etag()[0]
+
+    def _get_request_key(self, method, type, args):
+        return json.dumps([
+            method.__name__,
+            request.host_url,
+            type,
+            args,
+            sorted(request.args.items(multi=True))
+        ])
+
+    def _get_coalesced_response(self, method, type, *args):
+        responses = []
+
+        def compute():
+            response = current_app.make_response(method(self, type, *args))
+            responses.append(response)
+            if response.is_streamed:
+                return None
+            return response.status_code, response.get_data()
+
+        shared = self._single_flight.do(
+            self._get_request_key(method, type, args),
+            compute
+        )
+        if responses:
+            return responses[0]
+        if shared is None:
+            # A streamed body is consumed by the request that computed it.
+            return method(self, type, *args)
+        status, body = shared
+        return current_app.response_class(response=body, status=status)
+
+    def _get_document_tags(self, document):
+        tags = set()
+        data = document.get('data')
+        for resource_object in itertools.chain(
+            data if isinstance(data, list) else [data],
+            document.get('included', [])
+        ):
+            if resource_object is not None:
+                tags.add(resource_object['type'] + ':' + resource_object['id'])
+        return tags
+
+    def _listen_to_stores(self):
+        version = self.resource_registry.version
+        if self.response_cache is None or self._listening_version == version:
+            return
+        for resource in self.resource_registry.by_type.values():
+            listeners = getattr(resource.store, 'write_listeners', None)
+            if listeners is not None and self._on_write not in listeners:
+                listeners.append(self._on_write)
+        self._listening_version = version
+
+    def _on_write(self, touched, resized):
+        by_model_class = self.resource_registry.by_model_class
+        tags = set()
+        for model_class, id in touched:
+            if model_class in by_model_class:
+                tags.add(by_model_class[model_class].type + ':' + id)
+        for model_class in resized:
+            if model_class in by_model_class:
+                tags.add(by_model_class[model_class].type)
+        self.response_cache.invalidate(tags)
+
     def _get_json(self):
         data = request.get_data()
         try:
@@ -202,17 +607,57 @@ class DefaultController(object):
             params=qstring.nest(request.args.items(multi=True))
         )
 
-    def _serialize(self, input, params, links):
+    def _serialize(self, input, params, links, meta=None):
         serializer = Serializer(self.resource_registry, params)
-        data = serializer.dump(input, links)
+        data = serializer.dump(input, links, meta)
         return json.dumps(data)
 
-    def _get_links(self, params, count=None):
-        links = {
+    def _serialize_collection(self, input, params, count, meta=None):
+        links = self._get_collection_links(params, count)
+        return self._serialize(input, params, links, meta)
+
+    def _stream(self, input, params, get_links, get_meta=lambda: None):
+        serializer = Serializer(self.resource_registry, params)
+
+        def generate():
+            yield '{"data": ['
+            for index, resource_object in enumerate(
+                serializer.iter_dump(input)
+            ):
+                yield (', ' if index else '') + json.dumps(resource_object)
+            yield ']'
+            included = serializer.dump_included()
+            if included:
+                yield ', "included": ' + json.dumps(included)
+            yield ', "links": ' + json.dumps(get_links())
+            meta = get_meta()
+            if meta:
+                yield ', "meta": ' + json.dumps(meta)
+            yield '}'
+
+        return current_app.response_class(stream_with_context(generate()))
+
+    def _get_collection_meta(self, params, count):
+        meta = self._get_count_meta(params, count)
+        if meta is None and params.pagination.estimate_total:
+            resource = params.resource
+            total = resource.store.estimate_count(resource.model_class)
+            if total is not None:
+                meta = {'total': total, 'approximate': True}
+        return meta
+
+    def _get_count_meta(self, params, count):
+        if count is not None and params.pagination.approximate_count:
+            return {'total': count, 'approximate': True}
+
+    def _get_links(self, params):
+        return {
             'self': request.base_url + self._build_query_string(params.raw)
         }
-        if count is not None:
-            links.update(self._get_pagination_links(params, count))
+
+    def _get_collection_links(self, params, count):
+        links = self._get_links(params)
+        links.update(self._get_pagination_links(params, count))
         return links
 
     def _get_pagination_links(self, params, count):
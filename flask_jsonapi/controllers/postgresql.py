@@ -1,5 +1,17 @@
-from .. import errors
-from .default import DefaultController
+from collections import OrderedDict
+
+import sqlalchemy
+from flask import current_app, json
+from sqlalchemy.util import LRUCache
+
+from .. import errors, exceptions, link_builder
+from ..request_parser import RequestParser
+from .default import (
+    DefaultController,
+    cached_response,
+    coalesced_response,
+    conditional_response
+)
 
 try:
     from sqlalchemy_json_api import QueryBuilder
@@ -10,79 +22,354 @@ except ImportError:
 
 
 class PostgreSQLController(DefaultController):
-    def __init__(self, resource_registry):
-        self.resource_registry = resource_registry
+    def __init__(self, resource_registry, statement_cache_size=0, **kwargs):
+        super(PostgreSQLController, self).__init__(
+            resource_registry,
+            **kwargs
+        )
+        self.statement_cache_size = statement_cache_size
+        self._query_builder = None
+        self._query_builder_version = None
+        self._statements = OrderedDict()
+        self._compiled_cache = LRUCache(max(statement_cache_size, 1))
 
     @property
     def query_builder(self):
-        return QueryBuilder({
-            type: resource.model_class
-            for type, resource in self.resource_registry.by_type.items()
-        })
+        version = self.resource_registry.version
+        if self._query_builder_version != version:
+            self._query_builder = QueryBuilder({
+                type: resource.model_class
+                for type, resource in self.resource_registry.by_type.items()
+            })
+            self._query_builder_version = version
+            self._statements.clear()
+            self._compiled_cache.clear()
+        return self._query_builder
 
     def _get_query(self, resource, params):
-        store = resource.store
-        return store._paginate(
-            store.query(resource.model_class),
-            params.pagination
+        return self._paginate(resource.store.query(resource.model_class))
+
+    def _paginates_in_store(self, params):
+        # Pages without a count, such as cursor pages, are fetched through
+        # the store like in DefaultController, as it drops the extra row used
+        # to find the next page and sets the keys of the page, which the
+        # document built by PostgreSQL cannot do.
+        return not params.pagination.requires_count
+
+    def _paginate(self, query):
+        return query.offset(
+            sqlalchemy.bindparam('offset', type_=sqlalchemy.Integer)
+        ).limit(
+            sqlalchemy.bindparam('limit', type_=sqlalchemy.Integer)
         )
 
+    def _get_pagination_values(self, params):
+        return {
+            'offset': params.pagination.offset,
+            'limit': params.pagination.limit
+        }
+
+    def _get_shape(self, params):
+        fields = tuple(sorted(
+            (type, tuple(sorted(names)))
+            for type, names in params.fields.requested.items()
+        ))
+        return (params.resource.type, params.include.raw or None, fields)
+
+    def _get_link_params(self, links):
+        return {
+            name: sqlalchemy.bindparam('link_' + name, type_=sqlalchemy.Text)
+            for name in links
+        }
+
+    def _get_link_values(self, links):
+        return {'link_' + name: value for name, value in links.items()}
+
+    def _get_statement(self, key, build):
+        query_builder = self.query_builder
+        if not self.statement_cache_size:
+            return build(query_builder)
+        try:
+            statement = self._statements.pop(key)
+        except KeyError:
+            statement = build(query_builder)
+            if len(self._statements) >= self.statement_cache_size:
+                self._statements.popitem(last=False)
+        self._statements[key] = statement
+        return statement
+
+    def _select_bytes(self, statement):
+        return sqlalchemy.select([self._as_bytes(statement)])
+
+    def _as_bytes(self, statement):
+        # The document is fetched as UTF-8 encoded bytea so that it can be
+        # written to the response without decoding and encoding it again.
+        return sqlalchemy.func.convert_to(
+            statement.as_scalar(),
+            'UTF8',
+            type_=sqlalchemy.LargeBinary
+        )
+
+    def _make_response(self, document):
+        return current_app.response_class(response=bytes(document))
+
+    def _add_member(self, document, name, value):
+        # Splice the member into the closing brace of the document built by
+        # PostgreSQL, which avoids parsing it.
+        return b''.join([
+            bytes(document)[:-1],
+            b', ',
+            json.dumps(name).encode('utf8'),
+            b': ',
+            json.dumps(value).encode('utf8'),
+            b'}'
+        ])
+
+    def _execute(self, resource, statement, values):
+        connection = resource.store.session.connection(
+            mapper=sqlalchemy.inspect(resource.model_class)
+        )
+        if self.statement_cache_size:
+            connection = connection.execution_options(
+                compiled_cache=self._compiled_cache
+            )
+        return connection.execute(statement, values)
+
+    @conditional_response
+    @coalesced_response
+    @cached_response
     def fetch_one(self, type, id):
         resource = self._get_resource(type)
         params = self._build_params(type)
-        include = params.include.raw
         links = self._get_links(params)
-        query = self.query_builder.select_one(
-            resource.model_class,
-            id,
-            include=include.split(',') if include else None,
-            fields=params.fields,
-            links=links,
-            from_obj=resource.store.query(resource.model_class),
-            as_text=True
-        )
-        result = resource.store.session.execute(query).scalar()
-        if result is None:
+        document = self._fetch_document(resource, params, id, links)
+        if document is None:
             raise errors.ResourceNotFound(type, id)
-        return result
+        return self._make_response(document)
+
+    def _fetch_document(self, resource, params, id, links):
+        include = params.include.raw
+        statement = self._get_statement(
+            key=('fetch_one', self._get_shape(params), tuple(sorted(links))),
+            build=lambda query_builder: self._select_bytes(
+                query_builder.select_one(
+                    resource.model_class,
+                    sqlalchemy.bindparam('id'),
+                    include=include.split(',') if include else None,
+                    fields=params.fields,
+                    links=self._get_link_params(links),
+                    from_obj=resource.store.query(resource.model_class),
+                    as_text=True
+                )
+            )
+        )
+        values = self._get_link_values(links)
+        values['id'] = id
+        return self._execute(resource, statement, values).scalar()
 
+    @conditional_response
+    @coalesced_response
+    @cached_response
     def fetch(self, type):
         resource = self._get_resource(type)
         params = self._build_params(type)
+        if self._paginates_in_store(params):
+            return self._fetch_collection(resource, params)
         include = params.include.raw
-        count = resource.store.count(resource.model_class)
-        links = self._get_links(params, count)
-        query = self.query_builder.select(
-            resource.model_class,
-            include=include.split(',') if include else None,
-            fields=params.fields,
-            links=links,
-            from_obj=self._get_query(resource, params),
-            as_text=True
+        if params.pagination.approximate_count:
+            count = resource.store.count(
+                resource.model_class,
+                approximate=True
+            )
+        else:
+            count = resource.store.count(resource.model_class)
+        links = self._get_collection_links(params, count)
+        statement = self._get_statement(
+            key=('fetch', self._get_shape(params), tuple(sorted(links))),
+            build=lambda query_builder: self._select_bytes(
+                query_builder.select(
+                    resource.model_class,
+                    include=include.split(',') if include else None,
+                    fields=params.fields,
+                    links=self._get_link_params(links),
+                    from_obj=self._get_query(resource, params),
+                    as_text=True
+                )
+            )
         )
-        return resource.store.session.execute(query).scalar()
+        values = self._get_link_values(links)
+        values.update(self._get_pagination_values(params))
+        document = self._execute(resource, statement, values).scalar()
+        meta = self._get_count_meta(params, count)
+        if meta:
+            document = self._add_member(document, 'meta', meta)
+        return self._make_response(document)
 
+    @conditional_response
+    @cached_response
     def fetch_related(self, type, id, relationship):
         resource = self._get_resource(type)
         relationship = self._get_relationship(resource, relationship)
         params = self._build_params(relationship.type)
-        obj = self._fetch_object(resource, id)
-        include = params.include.raw
+        if relationship.many and self._paginates_in_store(params):
+            return self._fetch_related(resource, id, relationship, params)
+        row = self._fetch_related_row(resource, relationship, params, id)
         if relationship.many:
-            count = resource.store.count_related(obj, relationship.name)
+            links = self._get_collection_links(params, row.count)
         else:
-            count = None
-        links = self._get_links(params, count)
-        query = self.query_builder.select(
+            links = self._get_links(params)
+        return self._make_response(
+            self._add_member(row.document, 'links', links)
+        )
+
+    @conditional_response
+    @cached_response
+    def fetch_relationship(self, type, id, relationship):
+        resource = self._get_resource(type)
+        relationship = self._get_relationship(resource, relationship)
+        params = self._build_params(relationship.type)
+        if relationship.many and self._paginates_in_store(params):
+            return self._fetch_relationship(resource, id, relationship, params)
+        row = self._fetch_related_row(
+            resource,
+            relationship,
+            params,
+            id,
+            ids_only=True
+        )
+        if relationship.many:
+            links = self._get_collection_links(params, row.count)
+        else:
+            links = self._get_links(params)
+        links['related'] = link_builder.build_related_url(
+            type=type,
+            id=id,
+            relationship=relationship.name
+        )
+        return self._make_response(
+            self._add_member(row.document, 'links', links)
+        )
+
+    def _fetch_related_row(
+        self,
+        resource,
+        relationship,
+        params,
+        id,
+        ids_only=False
+    ):
+        statement = self._get_statement(
+            key=(
+                'fetch_related',
+                resource.type,
+                relationship.name,
+                ids_only
+            ) + self._get_shape(params),
+            build=lambda query_builder: self._select_related(
+                query_builder,
+                resource,
+                relationship,
+                params,
+                ids_only
+            )
+        )
+        values = {'id': id}
+        if relationship.many:
+            values.update(self._get_pagination_values(params))
+        row = self._execute(resource, statement, values).first()
+        if not row.found:
+            raise errors.ResourceNotFound(resource.type, id)
+        return row
+
+    def _select_related(
+        self,
+        query_builder,
+        resource,
+        relationship,
+        params,
+        ids_only
+    ):
+        store = resource.store
+        model_class = resource.model_class
+        id = sqlalchemy.bindparam('id')
+        query = store._query_related_by_id(model_class, id, relationship.name)
+        include = None if ids_only else params.include.raw
+        document = query_builder.select(
             relationship.model_class,
             include=include.split(',') if include else None,
             fields=params.fields,
-            links=links,
             as_text=True,
             multiple=relationship.many,
-            from_obj=resource.store._paginate(
-                resource.store._query_related(obj, relationship.name),
-                params.pagination
+            ids_only=ids_only,
+            from_obj=(
+                self._paginate(query)
+                if relationship.many else
+                query
+            )
+        )
+        columns = [
+            store.query(model_class).filter(
+                model_class.id == id
+            ).exists().label('found'),
+            self._as_bytes(document).label('document')
+        ]
+        if relationship.many:
+            count = sqlalchemy.select([sqlalchemy.func.count()]).select_from(
+                query.order_by(None).subquery()
+            )
+            columns.append(count.as_scalar().label('count'))
+        return sqlalchemy.select(columns)
+
+    def create(self, type):
+        self._listen_to_stores()
+        resource = self._get_resource(type)
+        params = self._build_params(type)
+        parser = RequestParser(resource=resource)
+        result = parser.parse(data=self._get_json())
+        try:
+            instance = resource.store.create(
+                model_class=resource.model_class,
+                id=result.id,
+                fields=result.fields
             )
+        except exceptions.ObjectAlreadyExists:
+            raise errors.ResourceAlreadyExists(type=type, id=result.id)
+        # The identity is read from the instance state, as reading the
+        # expired id attribute after the commit would reload the row.
+        id = sqlalchemy.inspect(instance).identity[0]
+        links = {
+            'self': link_builder.build_individual_resource_url(
+                type=type,
+                id=id
+            )
+        }
+        return current_app.response_class(
+            response=bytes(self._fetch_document(resource, params, id, links)),
+            status=201,
+            headers={'Location': links['self']}
+        )
+
+    def update(self, type, id):
+        self._listen_to_stores()
+        resource = self._get_resource(type)
+        self._check_precondition(resource, id)
+        params = self._build_params(type)
+        parser = RequestParser(resource=resource, id=id)
+        try:
+            result = parser.parse(data=self._get_json())
+        except errors.Error:
+            # A missing resource takes precedence over an invalid request
+            # body, as it does in DefaultController.
+            self._fetch_object(resource, id)
+            raise
+        updated = resource.store.update_by_id(
+            model_class=resource.model_class,
+            id=id,
+            fields=result.fields
+        )
+        if not updated:
+            raise errors.ResourceNotFound(type, id)
+        links = self._get_links(params)
+        return self._make_response(
+            self._fetch_document(resource, params, id, links)
         )
-        return resource.store.session.execute(query).scalar()
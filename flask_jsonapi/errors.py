@@ -71,6 +71,12 @@ class ResourceNotFound(Error):
         Error.__init__(self)
 
 
+class PreconditionFailed(Error):
+    status = '412'
+    title = 'Precondition failed'
+    detail = 'The resource does not match the If-Match request header.'
+
+
 class RelationshipNotFound(Error):
     status = '404'
     title = 'Relationship not found'
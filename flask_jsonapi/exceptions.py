@@ -29,3 +29,19 @@ class InvalidRelationship(JSONAPIException):
             relationship=self.relationship,
             model_class=self.model_class.__name__
         )
+
+
+class InvalidSortKey(JSONAPIException):
+    def __init__(self, model_class, column):
+        self.model_class = model_class
+        self.column = column
+
+    def __str__(self):
+        msg = (
+            '{column} is not a non-nullable column of {model_class} and '
+            'cannot order cursor pages.'
+        )
+        return msg.format(
+            column=self.column,
+            model_class=self.model_class.__name__
+        )
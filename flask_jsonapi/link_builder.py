@@ -1,4 +1,13 @@
-from flask import url_for
+import re
+
+from flask import g, has_request_context, request, url_for
+from werkzeug.urls import url_quote
+
+from ._compat import text_type
+
+ID_PLACEHOLDER = 'jsonapi-id-placeholder'
+
+_safe_id_re = re.compile(r'^[A-Za-z0-9_.~-]+$')
 
 
 def build_resource_collection_url(type):
@@ -6,29 +15,57 @@ def build_resource_collection_url(type):
 
 
 def build_individual_resource_url(type, id):
-    return url_for(
-        'jsonapi.fetch_one',
-        type=type,
-        id=id,
-        _external=True
-    )
+    return _build_url('jsonapi.fetch_one', id=id, type=type)
 
 
 def build_related_url(type, id, relationship):
-    return url_for(
+    return _build_url(
         'jsonapi.fetch_related',
-        type=type,
         id=id,
-        relationship=relationship,
-        _external=True
+        type=type,
+        relationship=relationship
     )
 
 
 def build_relationship_url(type, id, relationship):
-    return url_for(
+    return _build_url(
         'jsonapi.fetch_relationship',
-        type=type,
         id=id,
-        relationship=relationship,
-        _external=True
+        type=type,
+        relationship=relationship
     )
+
+
+def _build_url(endpoint, id, type, relationship=None):
+    prefix, suffix = _get_url_template(endpoint, type, relationship)
+    return prefix + _quote_id(id) + suffix
+
+
+def _quote_id(id):
+    id = text_type(id)
+    if _safe_id_re.match(id):
+        return id
+    return url_quote(id, safe='/:')
+
+
+def _get_url_template(endpoint, type, relationship):
+    try:
+        templates = g._jsonapi_url_templates
+    except AttributeError:
+        templates = g._jsonapi_url_templates = {}
+    # An application context can outlive its requests and be shared by
+    # requests to several hosts, so the templates are kept per URL root.
+    if has_request_context():
+        root = (request.host_url, request.script_root)
+    else:
+        root = None
+    key = (root, endpoint, type, relationship)
+    try:
+        return templates[key]
+    except KeyError:
+        values = {'type': type, 'id': ID_PLACEHOLDER}
+        if relationship is not None:
+            values['relationship'] = relationship
+        url = url_for(endpoint, _external=True, **values)
+        template = templates[key] = tuple(url.split(ID_PLACEHOLDER, 1))
+        return template
@@ -1,20 +1,47 @@
+import base64
+import binascii
+import json
 import math
 
-from . import errors
+from . import _compat, errors
 
 
 class Pagination(object):
-    def get_link_params(self, count):
+    def __init__(self, count=True, estimate_total=False):
+        self.requires_count = count
+        self.estimate_total = estimate_total
+        self.approximate_count = False
+        self.has_more = None
+
+    def set_has_more(self, has_more):
+        self.has_more = has_more
+
+    def get_link_params(self, count=None):
+        if (
+            count is not None and
+            self.approximate_count and
+            self.has_more is not None
+        ):
+            count = self._bound_count(count)
         return {
             'first': self.get_first(),
-            'last': self.get_last(count),
+            'last': self.get_last(count) if count is not None else None,
             'prev': self.get_prev() if self.has_prev() else None,
             'next': self.get_next() if self.has_next(count) else None,
         }
 
+    def _bound_count(self, count):
+        # An estimated count can be off in either direction. The extra row
+        # fetched with the page tells whether there is a next page, so the
+        # estimate is kept consistent with it.
+        if self.has_more:
+            return max(count, self.offset + self.limit + 1)
+        return max(min(count, self.offset + self.limit), self.offset + 1)
+
 
 class OffsetPagination(Pagination):
-    def __init__(self, offset, limit):
+    def __init__(self, offset, limit, **kwargs):
+        super(OffsetPagination, self).__init__(**kwargs)
         self.offset = offset
         self.limit = limit
 
@@ -33,7 +60,9 @@ class OffsetPagination(Pagination):
             'limit': self.limit
         }
 
-    def has_next(self, count):
+    def has_next(self, count=None):
+        if count is None:
+            return bool(self.has_more)
         return self.offset + self.limit < count
 
     def get_next(self):
@@ -56,7 +85,8 @@ class OffsetPagination(Pagination):
 
 
 class PagedPagination(Pagination):
-    def __init__(self, number, size):
+    def __init__(self, number, size, **kwargs):
+        super(PagedPagination, self).__init__(**kwargs)
         self.number = number
         self.size = size
 
@@ -83,7 +113,9 @@ class PagedPagination(Pagination):
             'size': self.size
         }
 
-    def has_next(self, count):
+    def has_next(self, count=None):
+        if count is None:
+            return bool(self.has_more)
         return self.number < self.get_pages(count)
 
     def get_next(self):
@@ -108,15 +140,113 @@ class PagedPagination(Pagination):
         )
 
 
+class CursorPagination(Pagination):
+    def __init__(self, size, after=None, before=None, **kwargs):
+        # Keyset pagination never needs a count.
+        kwargs['count'] = False
+        super(CursorPagination, self).__init__(**kwargs)
+        self.size = size
+        self.after = after
+        self.before = before
+        self.first_key = None
+        self.last_key = None
+
+    def set_page(self, first_key, last_key, has_more):
+        self.first_key = first_key
+        self.last_key = last_key
+        self.has_more = has_more
+
+    def get_link_params(self, count=None):
+        return {
+            'first': self.get_first(),
+            'last': None,
+            'prev': self.get_prev() if self.has_prev() else None,
+            'next': self.get_next() if self.has_next() else None,
+        }
+
+    def get_first(self):
+        return {
+            'size': self.size
+        }
+
+    def has_prev(self):
+        if self.first_key is None:
+            return False
+        if self.before is not None:
+            return self.has_more
+        return self.after is not None
+
+    def get_prev(self):
+        return {
+            'before': encode_cursor(self.first_key),
+            'size': self.size
+        }
+
+    def has_next(self, count=None):
+        if self.last_key is None:
+            return False
+        if self.before is not None:
+            return True
+        return self.has_more
+
+    def get_next(self):
+        return {
+            'after': encode_cursor(self.last_key),
+            'size': self.size
+        }
+
+    def __repr__(self):
+        return (
+            '<CursorPagination size={size} after={after!r} '
+            'before={before!r}>'
+        ).format(size=self.size, after=self.after, before=self.before)
+
+
+def encode_cursor(key):
+    data = json.dumps(list(key), default=_compat.text_type)
+    cursor = base64.urlsafe_b64encode(data.encode('utf8')).decode('ascii')
+    return cursor.rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        data = base64.urlsafe_b64decode((cursor + padding).encode('ascii'))
+        key = json.loads(data.decode('utf8'))
+    except (
+        AttributeError,
+        binascii.Error,
+        TypeError,
+        UnicodeError,
+        ValueError
+    ):
+        raise ValueError('invalid cursor')
+    if not isinstance(key, list) or not key:
+        raise ValueError('invalid cursor')
+    return key
+
+
 class Paginator(object):
-    def __init__(self, default_page_size=20, max_page_size=100):
+    def __init__(
+        self,
+        default_page_size=20,
+        max_page_size=100,
+        count=True,
+        estimate_total=False
+    ):
         self.max_page_size = max_page_size
         self.default_page_size = default_page_size
+        self.count = count
+        self.estimate_total = estimate_total
 
     def paginate(self, params):
         self._check_extra_params(params)
         params = self._validate(params)
-        return self.pagination_class(**params)
+        return self.pagination_class(
+            count=self.count,
+            estimate_total=self.estimate_total,
+            **params
+        )
 
     def _check_extra_params(self, params):
         try:
@@ -217,3 +347,49 @@ class PagedPaginator(Paginator):
             )
 
         return params
+
+
+class CursorPaginator(Paginator):
+    allowed_params = {'after', 'before', 'size'}
+    pagination_class = CursorPagination
+
+    def _validate(self, params):
+        try:
+            params['size'] = int(params.get('size', self.default_page_size))
+        except ValueError:
+            raise errors.InvalidPageValue(
+                param='size',
+                detail='size must be an integer'
+            )
+
+        if params['size'] < 1:
+            raise errors.InvalidPageValue(
+                param='size',
+                detail='size must be at least 1'
+            )
+
+        if params['size'] > self.max_page_size:
+            raise errors.InvalidPageValue(
+                param='size',
+                detail='size cannot exceed maximum page size of {}'.format(
+                    self.max_page_size
+                )
+            )
+
+        if 'after' in params and 'before' in params:
+            raise errors.InvalidPageValue(
+                param='before',
+                detail='before cannot be used together with after'
+            )
+
+        for param in ('after', 'before'):
+            if param in params:
+                try:
+                    params[param] = decode_cursor(params[param])
+                except ValueError:
+                    raise errors.InvalidPageValue(
+                        param=param,
+                        detail='{} must be a valid cursor'.format(param)
+                    )
+
+        return params
@@ -7,6 +7,7 @@ class Parameters(object):
     def __init__(self, resource_registry, type, params):
         resource = resource_registry.by_type[type]
 
+        self.resource = resource
         self.raw = params.copy()
 
         self.fields = FieldsParameter(
@@ -20,6 +21,7 @@ class Parameters(object):
         self.pagination = resource.paginator.paginate(
             params.pop('page', {})
         )
+        self.pagination.approximate_count = resource.approximate_count
 
         if params:
             raise errors.ParametersNotAllowed(params.keys())
@@ -32,6 +34,7 @@ class FieldsParameter(object):
         self.raw = fields
         self._resource_registry = resource_registry
         self.requested = self._parse()
+        self._field_sets = {}
 
     def _parse(self):
         try:
@@ -68,20 +71,30 @@ class FieldsParameter(object):
 
     def __getitem__(self, type):
         try:
-            return set(self.requested[type])
+            return self._field_sets[type]
         except KeyError:
-            return set(self._resource_registry.by_type[type].fields)
+            field_set = self._field_sets[type] = self._get_field_set(type)
+            return field_set
+
+    def _get_field_set(self, type):
+        try:
+            return frozenset(self.requested[type])
+        except KeyError:
+            return frozenset(self._resource_registry.by_type[type].fields)
 
     def __iter__(self):
         return iter(self.requested.keys())
 
+    def __contains__(self, type):
+        return type in self.requested
+
     def __repr__(self):
         return '<FieldsParameter {!r}>'.format(self.requested)
 
 
 class IncludeParameter(object):
     def __init__(self, resource, include):
-        self._resource = resource
+        self.resource = resource
         self.raw = include
         self.paths = self._parse_paths()
         self.tree = OrderedDict()
@@ -102,7 +115,7 @@ class IncludeParameter(object):
 
     def _add_relationship_path_to_tree(self, path):
         current_node = self.tree
-        resource = self._resource
+        resource = self.resource
         for name in path:
             if name not in current_node:
                 current_node[name] = OrderedDict()
@@ -203,19 +203,33 @@ class RequestParser(object):
         path,
         ignore_not_found=False
     ):
-        objs = []
         _ensure_array(data, path)
-        for index, resource_identifier in enumerate(data):
+        resource = relationship.resource
+        ids = [
+            self._validate_resource_identifier(
+                resource=resource,
+                data=resource_identifier,
+                path=path + [str(index)]
+            )
+            for index, resource_identifier in enumerate(data)
+        ]
+        objs_by_id = resource.store.fetch_many(
+            model_class=resource.model_class,
+            ids=ids
+        )
+        objs = []
+        for index, id in enumerate(ids):
             try:
-                obj = self._parse_resource_identifier(
-                    resource=relationship.resource,
-                    data=resource_identifier,
-                    path=path + [str(index)]
-                )
-                objs.append(obj)
-            except errors.ResourceNotFound:
+                objs.append(objs_by_id[id])
+            except KeyError:
                 if not ignore_not_found:
-                    raise
+                    raise errors.ResourceNotFound(
+                        type=resource.type,
+                        id=id,
+                        source_pointer=json_pointer_from_path(
+                            path + [str(index)]
+                        )
+                    )
         return objs
 
     def _parse_to_one_resource_linkage(self, relationship, data, path):
@@ -227,27 +241,31 @@ class RequestParser(object):
             )
 
     def _parse_resource_identifier(self, resource, data, path):
-        _ensure_object(data=data, path=path)
-        _require_property(data=data, property_='type', path=path)
-        _require_property(data=data, property_='id', path=path)
-        self._validate_type(
-            expected_type=resource.type,
-            data=data['type'],
-            path=path + ['type']
-        )
-        _ensure_string(data=data['id'], path=path + ['id'])
+        id = self._validate_resource_identifier(resource, data, path)
         try:
             return resource.store.fetch_one(
                 model_class=resource.model_class,
-                id=data['id']
+                id=id
             )
         except exceptions.ObjectNotFound:
             raise errors.ResourceNotFound(
                 type=resource.type,
-                id=data['id'],
+                id=id,
                 source_pointer=json_pointer_from_path(path)
             )
 
+    def _validate_resource_identifier(self, resource, data, path):
+        _ensure_object(data=data, path=path)
+        _require_property(data=data, property_='type', path=path)
+        _require_property(data=data, property_='id', path=path)
+        self._validate_type(
+            expected_type=resource.type,
+            data=data['type'],
+            path=path + ['type']
+        )
+        _ensure_string(data=data['id'], path=path + ['id'])
+        return data['id']
+
     def _validate_type(self, expected_type, data, path):
         _ensure_string(data=data, path=path)
         if data != expected_type:
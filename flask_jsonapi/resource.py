@@ -1,6 +1,8 @@
 from . import exceptions
 from .paginator import PagedPaginator
 
+LOADING_STRATEGIES = ('auto', 'joined', 'selectin', 'subquery')
+
 
 class Resource(object):
     def __init__(
@@ -10,18 +12,26 @@ class Resource(object):
         model_class,
         fields,
         paginator=None,
-        allow_client_generated_ids=False
+        allow_client_generated_ids=False,
+        loading_strategy='subquery',
+        approximate_count=False,
+        etag=False,
+        version_attribute=None
     ):
         self._registry = None
         self.type = type
         self.model_class = model_class
         self.store = store
+        self.loading_strategy = _check_loading_strategy(loading_strategy)
         self.fields = {}
         self.attributes = {}
         self.relationships = {}
         self._add_fields(fields)
         self.paginator = PagedPaginator() if paginator is None else paginator
         self.allow_client_generated_ids = allow_client_generated_ids
+        self.approximate_count = approximate_count
+        self.etag = etag
+        self.version_attribute = version_attribute
 
     def _add_fields(self, fields):
         for field in fields:
@@ -94,32 +104,42 @@ class Relationship(Field):
         name,
         allow_include=None,
         allow_full_replacement=False,
+        loading_strategy=None,
         **kwargs
     ):
         super(Relationship, self).__init__(name, **kwargs)
         self.allow_include = allow_include
         self.allow_full_replacement = allow_full_replacement
+        if loading_strategy is not None:
+            _check_loading_strategy(loading_strategy)
+        self.loading_strategy = loading_strategy
 
     def bind(self, *args, **kwargs):
         super(Relationship, self).bind(*args, **kwargs)
-        self.many = self.parent.store.is_to_many_relationship(
+        store = self.parent.store
+        self.many = store.is_to_many_relationship(
             self.parent.model_class,
             self.name
         )
-        if self.allow_include is None:
-            self.allow_include = not self.many
-
-    @property
-    def model_class(self):
-        return self.parent.store.get_related_model_class(
+        self.model_class = store.get_related_model_class(
             self.parent.model_class,
             self.name
         )
+        if self.allow_include is None:
+            self.allow_include = not self.many
+        if self.loading_strategy is None:
+            self.loading_strategy = self.parent.loading_strategy
+
+    def resolve(self, resource):
+        self.resource = resource
+        self.type = resource.type
 
-    @property
-    def resource(self):
-        return self.parent._registry.by_model_class[self.model_class]
 
-    @property
-    def type(self):
-        return self.resource.type
+def _check_loading_strategy(loading_strategy):
+    if loading_strategy not in LOADING_STRATEGIES:
+        raise ValueError(
+            'loading_strategy must be one of {strategies}'.format(
+                strategies=', '.join(LOADING_STRATEGIES)
+            )
+        )
+    return loading_strategy
@@ -5,6 +5,8 @@ class ResourceRegistry(object):
     def __init__(self):
         self.by_type = {}
         self.by_model_class = {}
+        self.version = 0
+        self.register_listeners = []
 
     def register(self, resource):
         if resource.type in self.by_type:
@@ -22,3 +24,16 @@ class ResourceRegistry(object):
         resource.register(self)
         self.by_type[resource.type] = resource
         self.by_model_class[resource.model_class] = resource
+        self.version += 1
+        self._resolve_relationships()
+        for listener in self.register_listeners:
+            listener()
+
+    def _resolve_relationships(self):
+        for resource in self.by_type.values():
+            for relationship in resource.relationships.values():
+                try:
+                    related = self.by_model_class[relationship.model_class]
+                except KeyError:
+                    continue
+                relationship.resolve(related)
@@ -1,16 +1,54 @@
 import itertools
+import weakref
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy.util import LRUCache
 
 from . import link_builder
 
+# Sparse fieldsets are chosen by the client, so only the plans of the most
+# recently used ones are kept for each resource.
+PLAN_CACHE_SIZE = 100
+
+SerializationPlan = namedtuple(
+    'SerializationPlan',
+    ('attributes', 'relationships')
+)
+
+Identity = namedtuple('Identity', ('model', 'resource', 'id', 'identifier'))
+
+_plans = weakref.WeakKeyDictionary()
+
+
+def get_serialization_plan(resource, fields):
+    try:
+        resource_plans = _plans[resource]
+    except KeyError:
+        resource_plans = _plans[resource] = LRUCache(PLAN_CACHE_SIZE)
+    try:
+        return resource_plans[fields]
+    except KeyError:
+        plan = resource_plans[fields] = SerializationPlan(
+            attributes=tuple(
+                name for name in resource.attributes if name in fields
+            ),
+            relationships=tuple(
+                relationship
+                for name, relationship in resource.relationships.items()
+                if name in fields
+            )
+        )
+        return plan
+
 
 class Serializer(object):
     def __init__(self, resource_registry, params):
         self.resource_registry = resource_registry
         self.params = params
 
-    def dump(self, input_, links=None):
+    def dump(self, input_, links=None, meta=None):
         many = isinstance(input_, list)
-        self._included_resource_objects = set()
+        self._reset()
         data = self._dump_primary_data(input_, many)
         included = self._dump_included_data(input_, many)
         document = {'data': data}
@@ -18,9 +56,51 @@ class Serializer(object):
             document['included'] = included
         if links:
             document['links'] = links
+        if meta:
+            document['meta'] = meta
         return document
 
+    def iter_dump(self, models):
+        self._reset()
+        self._included_models = OrderedDict()
+        visited = set()
+        for model in models:
+            yield self._dump_resource_object(model)
+            for included_model in self._iter_included_models(
+                [model],
+                self.params.include.tree,
+                visited
+            ):
+                identifier = self._get_identifier(included_model)
+                self._included_models.setdefault(identifier, included_model)
+            # The identities hold on to their models, so they are dropped
+            # after every primary model to keep memory use constant.
+            self._identities.clear()
+
+    def iter_export(self, models, batch_size=100):
+        models = iter(models)
+        while True:
+            batch = list(itertools.islice(models, batch_size))
+            if not batch:
+                break
+            # Nothing is included in an export, so the state of the dump is
+            # dropped after every batch to keep memory use constant.
+            self._reset()
+            self._load_related_ids(batch)
+            for model in batch:
+                yield self._dump_resource_object(model)
+
+    def dump_included(self):
+        models = [
+            model
+            for model in self._included_models.values()
+            if not self._has_already_been_included(model)
+        ]
+        self._load_related_ids(models)
+        return [self._dump_resource_object(model) for model in models]
+
     def dump_relationship(self, input_, links=None):
+        self._reset()
         many = isinstance(input_, list)
         if many:
             data = [self._dump_resource_identifier(m) for m in input_]
@@ -31,8 +111,14 @@ class Serializer(object):
             document['links'] = links
         return document
 
+    def _reset(self):
+        self._included_resource_objects = set()
+        self._related_ids = {}
+        self._identities = {}
+
     def _dump_primary_data(self, input_, many):
         if many:
+            self._load_related_ids(input_)
             return [self._dump_resource_object(model) for model in input_]
         elif input_ is None:
             return None
@@ -43,31 +129,58 @@ class Serializer(object):
         if input_ is None:
             return []
         input_ = input_ if many else [input_]
-        models = itertools.chain.from_iterable(
-            self._iter_included_models(model, self.params.include.tree)
-            for model in input_
-        )
-        return [
-            self._dump_resource_object(model)
-            for model in models
-            if not self._has_already_been_included(model)
-        ]
+        models = OrderedDict()
+        for model in self._iter_included_models(
+            input_,
+            self.params.include.tree,
+            set()
+        ):
+            identifier = self._get_identifier(model)
+            if identifier not in self._included_resource_objects:
+                models.setdefault(identifier, model)
+        models = list(models.values())
+        self._load_related_ids(models)
+        return [self._dump_resource_object(model) for model in models]
+
+    def _load_related_ids(self, models):
+        models_by_resource = OrderedDict()
+        for model in models:
+            resource = self._get_identity(model).resource
+            models_by_resource.setdefault(resource, []).append(model)
+        for resource, models in models_by_resource.items():
+            for relationship in self._get_plan(resource).relationships:
+                if not (relationship.many and relationship.allow_include):
+                    continue
+                related_ids = resource.store.get_related_ids(
+                    models,
+                    relationship.name
+                )
+                for model, ids in zip(models, related_ids):
+                    self._related_ids[id(model), relationship.name] = ids
 
     def _dump_resource_object(self, model):
-        resource = self._get_resource(model)
-        identifier = (resource.type, resource.store.get_id(model))
-        self._included_resource_objects.add(identifier)
+        identity = self._get_identity(model)
+        resource = identity.resource
+        plan = self._get_plan(resource)
+        self._included_resource_objects.add(identity.identifier)
 
         resource_object = {
-            'id': resource.store.get_id(model),
+            'id': identity.id,
             'type': resource.type,
         }
 
-        attributes_object = self._dump_attributes_object(resource, model)
+        attributes_object = self._dump_attributes_object(
+            resource,
+            plan,
+            model
+        )
         if attributes_object:
             resource_object['attributes'] = attributes_object
 
-        relationships_object = self._dump_relationships_object(resource, model)
+        relationships_object = self._dump_relationships_object(
+            identity,
+            plan
+        )
         if relationships_object:
             resource_object['relationships'] = relationships_object
 
@@ -80,83 +193,126 @@ class Serializer(object):
 
         return resource_object
 
-    def _get_resource(self, model):
-        return self.resource_registry.by_model_class[model.__class__]
+    def _get_identity(self, model):
+        try:
+            return self._identities[id(model)]
+        except KeyError:
+            resource = self.resource_registry.by_model_class[model.__class__]
+            id_ = resource.store.get_id(model)
+            # The model is kept in its identity, so that its id() cannot be
+            # reused by another object while the identity is cached.
+            identity = self._identities[id(model)] = Identity(
+                model=model,
+                resource=resource,
+                id=id_,
+                identifier=(resource.type, id_)
+            )
+            return identity
+
+    def _get_plan(self, resource):
+        return get_serialization_plan(
+            resource,
+            self.params.fields[resource.type]
+        )
 
-    def _dump_attributes_object(self, resource, model):
-        fields = self.params.fields[resource.type]
-        attributes = fields & set(resource.attributes)
+    def _dump_attributes_object(self, resource, plan, model):
+        get_attribute = resource.store.get_attribute
         return {
-            attr: resource.store.get_attribute(model, attr)
-            for attr in attributes
+            attr: get_attribute(model, attr)
+            for attr in plan.attributes
         }
 
-    def _dump_relationships_object(self, resource, model):
-        fields = self.params.fields[resource.type]
-        relationships = fields & set(resource.relationships)
+    def _dump_relationships_object(self, identity, plan):
         return {
-            relationship: self._dump_relationship_object(model, relationship)
-            for relationship in relationships
+            relationship.name: self._dump_relationship_object(
+                identity,
+                relationship
+            )
+            for relationship in plan.relationships
         }
 
-    def _dump_relationship_object(self, model, relationship_name):
-        resource = self._get_resource(model)
-        relationship = resource.relationships[relationship_name]
+    def _dump_relationship_object(self, identity, relationship):
+        resource = identity.resource
+        model = identity.model
         relationship_object = {}
         if relationship.allow_include:
-            related = resource.store.get_related(model, relationship_name)
             if relationship.many:
-                data = [self._dump_resource_identifier(m) for m in related]
+                data = self._dump_to_many_linkage(
+                    resource,
+                    model,
+                    relationship
+                )
             else:
-                data = self._dump_resource_identifier(related)
+                data = self._dump_to_one_linkage(resource, model, relationship)
             relationship_object['data'] = data
         relationship_object['links'] = {
             "self": link_builder.build_relationship_url(
                 type=resource.type,
-                id=resource.store.get_id(model),
+                id=identity.id,
                 relationship=relationship.name
             ),
             "related": link_builder.build_related_url(
                 type=resource.type,
-                id=resource.store.get_id(model),
+                id=identity.id,
                 relationship=relationship.name
             ),
         }
         return relationship_object
 
+    def _dump_to_many_linkage(self, resource, model, relationship):
+        try:
+            ids = self._related_ids[id(model), relationship.name]
+        except KeyError:
+            related = resource.store.get_related(model, relationship.name)
+            return [self._dump_resource_identifier(m) for m in related]
+        return [{"type": relationship.type, "id": id_} for id_ in ids]
+
+    def _dump_to_one_linkage(self, resource, model, relationship):
+        id = resource.store.get_related_id(model, relationship.name)
+        if id is not None:
+            return {
+                "type": relationship.type,
+                "id": id
+            }
+
     def _dump_resource_identifier(self, model):
         if model is not None:
-            resource = self._get_resource(model)
+            identity = self._get_identity(model)
             return {
-                "type": resource.type,
-                "id": resource.store.get_id(model)
+                "type": identity.resource.type,
+                "id": identity.id
             }
 
     def _has_already_been_included(self, model):
-        resource = self._get_resource(model)
-        identifier = (resource.type, resource.store.get_id(model))
+        identifier = self._get_identifier(model)
         return identifier in self._included_resource_objects
 
-    def _iter_included_models(self, model, include):
-        resource = self._get_resource(model)
-        store = resource.store
-        for relationship_name in include:
-            relationship = resource.relationships[relationship_name]
-            if relationship.many:
-                related_models = store.get_related(model, relationship.name)
-                for related_model in related_models:
-                    yield related_model
-                    for m in self._iter_included_models(
-                        related_model,
-                        include[relationship.name]
-                    ):
-                        yield m
-            else:
-                related_model = store.get_related(model, relationship.name)
-                if related_model is not None:
-                    yield related_model
-                    for m in self._iter_included_models(
-                        related_model,
-                        include[relationship.name]
-                    ):
-                        yield m
+    def _get_identifier(self, model):
+        return self._get_identity(model).identifier
+
+    def _iter_included_models(self, models, include, visited):
+        # The include tree is walked depth first with an explicit stack, so
+        # that included models keep their order of first appearance, while a
+        # model reachable through several parents is only expanded once for
+        # each node of the tree.
+        stack = [(model, include, False) for model in reversed(models)]
+        while stack:
+            model, include, is_included = stack.pop()
+            identity = self._get_identity(model)
+            key = (identity.identifier, id(include))
+            if key in visited:
+                continue
+            visited.add(key)
+            if is_included:
+                yield model
+            resource = identity.resource
+            related_models = []
+            for name, subtree in include.items():
+                related = resource.store.get_related(model, name)
+                if not resource.relationships[name].many:
+                    related = [] if related is None else [related]
+                related_models.extend(
+                    (related_model, subtree, True)
+                    for related_model in related
+                )
+            stack.extend(reversed(related_models))
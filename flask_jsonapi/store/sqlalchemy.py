@@ -1,36 +1,242 @@
 from __future__ import absolute_import
 
+import datetime
+import itertools
+import uuid
+from collections import OrderedDict, namedtuple
+
 import sqlalchemy
 from sqlalchemy import orm
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.expression import BinaryExpression, UnaryExpression
+
+from .. import _compat, errors, exceptions
+from ..paginator import CursorPagination
+
+# Cursors hold dates and times in the format of str(), see encode_cursor.
+CURSOR_TIME_FORMATS = {
+    datetime.date: ('%Y-%m-%d',),
+    datetime.datetime: (
+        '%Y-%m-%d %H:%M:%S.%f%z',
+        '%Y-%m-%d %H:%M:%S%z',
+        '%Y-%m-%d %H:%M:%S.%f',
+        '%Y-%m-%d %H:%M:%S',
+    ),
+    datetime.time: ('%H:%M:%S.%f', '%H:%M:%S'),
+}
+
+RelationshipInfo = namedtuple(
+    'RelationshipInfo',
+    (
+        'property',
+        'model_class',
+        'uselist',
+        'direction',
+        'local_remote_pairs',
+        'foreign_key'
+    )
+)
 
-from .. import exceptions
+SortKeyPart = namedtuple('SortKeyPart', ('column', 'key', 'descending'))
 
 
 class SQLAlchemyStore(object):
-    def __init__(self, session):
+    def __init__(self, session, window_count=False, count_cache=None):
         self.session = session
+        self.window_count = window_count
+        self.count_cache = count_cache
+        self.write_listeners = []
+        self._relationship_info = {}
 
     def fetch(self, model_class, params=None):
+        return self._get_page(self._fetch_query(model_class, params), params)
+
+    def fetch_with_count(self, model_class, params=None):
+        return self._fetch_with_count(
+            query=self._fetch_query(model_class, params),
+            params=params,
+            count=lambda: self.count(
+                model_class,
+                approximate=self._counts_approximately(params)
+            )
+        )
+
+    def iter_fetch(self, model_class, params=None, batch_size=100):
+        query = self._fetch_query(model_class, params)
+        return self._iterate(query, params, batch_size)
+
+    def iter_fetch_all(self, model_class, params=None, batch_size=100):
+        query = self.query(model_class)
+        if params:
+            query = self._load_only_requested_fields(query, params)
+        query = query.order_by(*sqlalchemy.inspect(model_class).primary_key)
+        return query.yield_per(batch_size)
+
+    def _fetch_query(self, model_class, params):
         query = self.query(model_class)
         if params:
             query = self._include_related(query, params.include)
+            query = self._load_only_requested_fields(query, params)
             query = self._paginate(query, params.pagination)
-        return query.all()
+        return query
 
     def fetch_one(self, model_class, id, params=None):
         query = self.query(model_class).filter_by(id=id)
         if params:
             query = self._include_related(query, params.include)
+            query = self._load_only_requested_fields(query, params)
         try:
             return query.one()
         except orm.exc.NoResultFound:
             raise exceptions.ObjectNotFound
 
+    def fetch_version(self, model_class, id, attribute):
+        query = self.query(model_class).filter_by(id=id).with_entities(
+            getattr(model_class, attribute)
+        )
+        row = query.first()
+        if row is None:
+            raise exceptions.ObjectNotFound
+        return row[0]
+
+    def fetch_many(self, model_class, ids):
+        if not ids:
+            return {}
+        query = self.query(model_class)
+        objs_by_key = {
+            self._get_id_key(model_class, obj.id): obj
+            for obj in query.filter(model_class.id.in_(set(ids)))
+        }
+        objs = {}
+        for id in ids:
+            key = self._get_id_key(model_class, id)
+            if key in objs_by_key:
+                objs[id] = objs_by_key[key]
+        return objs
+
+    def _get_id_key(self, model_class, id):
+        # The database matches ids such as '01' or upper case UUIDs, so
+        # compare them in the form of the primary key column.
+        column_type = model_class.id.property.columns[0].type
+        if isinstance(column_type, postgresql.UUID):
+            python_type = uuid.UUID
+        else:
+            try:
+                python_type = column_type.python_type
+            except NotImplementedError:
+                return id
+        if isinstance(id, python_type):
+            return id
+        try:
+            return python_type(id)
+        except (TypeError, ValueError):
+            return id
+
     def get_related(self, instance, relationship):
         return getattr(instance, relationship)
 
-    def count_related(self, instance, relationship):
-        return self._query_related(instance, relationship).count()
+    def get_related_id(self, instance, relationship):
+        info = self.get_relationship_info(instance.__class__, relationship)
+        if info.foreign_key is None:
+            related = getattr(instance, relationship)
+            return None if related is None else self.get_id(related)
+        id = getattr(instance, info.foreign_key)
+        return None if id is None else str(id)
+
+    def get_related_ids(self, instances, relationship):
+        related_ids = {}
+        unloaded = []
+        for instance in instances:
+            if relationship in instance.__dict__:
+                related_ids[instance] = [
+                    self.get_id(related)
+                    for related in getattr(instance, relationship)
+                ]
+            else:
+                unloaded.append(instance)
+        if unloaded:
+            related_ids.update(
+                self._query_related_ids(unloaded, relationship)
+            )
+        return [related_ids[instance] for instance in instances]
+
+    def _query_related_ids(self, instances, relationship):
+        model_class = instances[0].__class__
+        relationship_property = self._get_relationship_property(
+            model_class,
+            relationship
+        )
+        related_model_class = relationship_property.mapper.class_
+        parent = orm.aliased(model_class)
+        query = self.session.query(parent.id, related_model_class.id)
+        query = query.select_from(parent).join(
+            related_model_class,
+            getattr(parent, relationship)
+        )
+        query = query.filter(
+            parent.id.in_({instance.id for instance in instances})
+        )
+        if relationship_property.order_by:
+            query = query.order_by(*relationship_property.order_by)
+        ids_by_parent = {}
+        for parent_id, related_id in query:
+            ids = ids_by_parent.setdefault(parent_id, OrderedDict())
+            ids[str(related_id)] = None
+        return {
+            instance: list(ids_by_parent.get(instance.id, ()))
+            for instance in instances
+        }
+
+    def count_related(self, instance, relationship, approximate=False):
+        if approximate:
+            estimate = self._explain_count(
+                self._query_related(instance, relationship)
+            )
+            if estimate is not None:
+                return estimate
+        return self._cached_count_related(
+            instance.__class__,
+            self.get_id(instance),
+            relationship,
+            lambda: self._query_related(instance, relationship).count()
+        )
+
+    def count_related_by_id(
+        self,
+        model_class,
+        id,
+        relationship,
+        approximate=False
+    ):
+        query = self._query_related_by_id(model_class, id, relationship)
+        if approximate:
+            estimate = self._explain_count(query)
+            if estimate is not None:
+                return estimate
+        return self._cached_count_related(
+            model_class,
+            id,
+            relationship,
+            lambda: query.order_by(None).count()
+        )
+
+    def _cached_count_related(self, model_class, id, relationship, count):
+        if self.count_cache is None:
+            return count()
+        relationship_property = self._get_relationship_property(
+            model_class,
+            relationship
+        )
+        tables = [relationship_property.mapper.local_table]
+        if relationship_property.secondary is not None:
+            tables.append(relationship_property.secondary)
+        key = 'count_related:{table}:{id}:{relationship}'.format(
+            table=sqlalchemy.inspect(model_class).local_table.fullname,
+            id=id,
+            relationship=relationship
+        )
+        return self._cached_count(key, tables, count)
 
     def fetch_related(self, instance, relationship, params=None):
         if self.is_to_many_relationship(instance.__class__, relationship):
@@ -42,17 +248,132 @@ class SQLAlchemyStore(object):
         query = self._query_related(instance, relationship)
         if params:
             query = self._include_related(query, params.include)
+            query = self._load_only_requested_fields(query, params)
         try:
             return query.one()
         except orm.exc.NoResultFound:
             return None
 
+    def iter_fetch_related(
+        self,
+        instance,
+        relationship,
+        params=None,
+        batch_size=100
+    ):
+        query = self._fetch_many_related_query(instance, relationship, params)
+        order_by = self._get_related_order_by(instance, relationship)
+        return self._iterate(query, params, batch_size, order_by)
+
+    def fetch_related_with_count(self, instance, relationship, params=None):
+        return self._fetch_with_count(
+            query=self._fetch_many_related_query(
+                instance,
+                relationship,
+                params
+            ),
+            params=params,
+            count=lambda: self.count_related(
+                instance,
+                relationship,
+                approximate=self._counts_approximately(params)
+            ),
+            order_by=self._get_related_order_by(instance, relationship)
+        )
+
+    def _fetch_with_count(self, query, params, count, order_by=()):
+        if params and not params.pagination.requires_count:
+            return self._get_page(query, params, order_by), None
+        if self._fetches_extra_row(params):
+            return self._get_page(query, params, order_by), count()
+        if not self.window_count or self.count_cache is not None:
+            return query.all(), count()
+        rows = query.add_columns(sqlalchemy.func.count().over()).all()
+        if rows:
+            return [row[0] for row in rows], rows[0][1]
+        if params is None or not params.pagination.offset:
+            return [], 0
+        return [], count()
+
     def _fetch_many_related(self, instance, relationship, params):
+        return self._get_page(
+            self._fetch_many_related_query(instance, relationship, params),
+            params,
+            self._get_related_order_by(instance, relationship)
+        )
+
+    def _fetch_many_related_query(self, instance, relationship, params):
         query = self._query_related(instance, relationship)
         if params:
             query = self._include_related(query, params.include)
-            query = self._paginate(query, params.pagination)
-        return query.all()
+            query = self._load_only_requested_fields(query, params)
+            query = self._paginate(
+                query,
+                params.pagination,
+                self._get_related_order_by(instance, relationship)
+            )
+        return query
+
+    def _get_related_order_by(self, instance, relationship):
+        relationship_property = self._get_relationship_property(
+            instance.__class__,
+            relationship
+        )
+        return tuple(relationship_property.order_by or ())
+
+    def _iterate(self, query, params, batch_size, order_by=()):
+        if params and isinstance(params.pagination, CursorPagination):
+            # The extra row used to detect the next page must be dropped
+            # before the page is handed out, so cursor pages are buffered.
+            query = self._get_page(query, params, order_by)
+        elif params is None or not params.include.paths:
+            # Eager loading of included relationships cannot be combined
+            # with yield_per, so those queries are buffered as usual.
+            query = query.yield_per(batch_size)
+        if self._fetches_extra_row(params):
+            for index, instance in enumerate(query):
+                if index == params.pagination.limit:
+                    params.pagination.set_has_more(True)
+                    break
+                yield instance
+            else:
+                params.pagination.set_has_more(False)
+        else:
+            for instance in query:
+                yield instance
+
+    def _get_page(self, query, params, order_by=()):
+        instances = query.all()
+        if params and isinstance(params.pagination, CursorPagination):
+            instances = self._get_cursor_page(
+                query,
+                instances,
+                params.pagination,
+                order_by
+            )
+        elif self._fetches_extra_row(params):
+            limit = params.pagination.limit
+            params.pagination.set_has_more(len(instances) > limit)
+            instances = instances[:limit]
+        return instances
+
+    def _fetches_extra_row(self, params):
+        return (
+            params is not None and
+            params.pagination is not None and
+            not isinstance(params.pagination, CursorPagination) and
+            (
+                not params.pagination.requires_count or
+                params.pagination.approximate_count
+            )
+        )
+
+    def _counts_approximately(self, params):
+        return (
+            params is not None and
+            params.pagination is not None and
+            params.pagination.approximate_count
+        )
 
     def _query_related(self, instance, relationship):
         related_model_class = self.get_related_model_class(
@@ -69,38 +390,481 @@ class SQLAlchemyStore(object):
             query = query.order_by(*relationship_property.order_by)
         return query
 
-    def count(self, model_class):
-        return self.query(model_class).count()
+    def _query_related_by_id(self, model_class, id, relationship):
+        relationship_property = self._get_relationship_property(
+            model_class,
+            relationship
+        )
+        parent = orm.aliased(model_class)
+        query = self.session.query(relationship_property.mapper.class_)
+        query = query.select_from(parent).join(getattr(parent, relationship))
+        query = query.filter(parent.id == id)
+        if relationship_property.order_by:
+            query = query.order_by(*relationship_property.order_by)
+        return query
+
+    def count(self, model_class, approximate=False):
+        if approximate:
+            estimate = self.estimate_count(model_class)
+            # A table that has never been analyzed has no estimate, and
+            # counting it is cheap as long as it is small.
+            if estimate:
+                return estimate
+        if self.count_cache is None:
+            return self.query(model_class).count()
+        table = sqlalchemy.inspect(model_class).local_table
+        return self._cached_count(
+            'count:' + table.fullname,
+            [table],
+            lambda: self.query(model_class).count()
+        )
+
+    def _cached_count(self, key, tables, count):
+        # Cached counts are keyed by a generation token of every table they
+        # depend on. Writes replace the tokens, which leaves the stale counts
+        # unreachable until they expire from the cache.
+        key = ':'.join(
+            [key] + [self._get_count_generation(table) for table in tables]
+        )
+        value = self.count_cache.get(key)
+        if value is None:
+            value = count()
+            self.count_cache.set(key, value)
+        return value
+
+    def _get_count_generation(self, table):
+        key = 'count_generation:' + table.fullname
+        generation = self.count_cache.get(key)
+        if generation is None:
+            generation = self._set_count_generation(table)
+        return generation
+
+    def _set_count_generation(self, table):
+        generation = uuid.uuid4().hex
+        self.count_cache.set('count_generation:' + table.fullname, generation)
+        return generation
+
+    def _invalidate_counts(self, model_class):
+        if self.count_cache is None:
+            return
+        mapper = sqlalchemy.inspect(model_class)
+        tables = set(mapper.tables)
+        for relationship_property in mapper.relationships:
+            if relationship_property.secondary is not None:
+                tables.add(relationship_property.secondary)
+            elif relationship_property.direction is orm.interfaces.ONETOMANY:
+                tables.add(relationship_property.mapper.local_table)
+        for table in tables:
+            self._set_count_generation(table)
+
+    def estimate_count(self, model_class):
+        mapper = sqlalchemy.inspect(model_class)
+        dialect = self.session.get_bind(mapper=mapper).dialect
+        if dialect.name != 'postgresql':
+            return None
+        table = dialect.identifier_preparer.format_table(mapper.local_table)
+        estimate = self.session.execute(
+            sqlalchemy.text(
+                'SELECT reltuples FROM pg_class '
+                'WHERE oid = to_regclass(:table)'
+            ),
+            {'table': table}
+        ).scalar()
+        if estimate is None or estimate < 0:
+            return None
+        return int(estimate)
+
+    def _explain_count(self, query):
+        mapper = sqlalchemy.inspect(query.column_descriptions[0]['entity'])
+        connection = self.session.connection(mapper=mapper)
+        if connection.dialect.name != 'postgresql':
+            return None
+        compiled = query.order_by(None).statement.compile(
+            dialect=connection.dialect
+        )
+        plan = connection.execute(
+            'EXPLAIN (FORMAT JSON) ' + str(compiled),
+            compiled.params
+        ).scalar()
+        return int(plan[0]['Plan']['Plan Rows'])
 
     def query(self, model_class):
         return self.session.query(model_class)
 
     def _include_related(self, query, include):
-        paths = [] if include is None else include.paths
-        for path in paths:
-            option = orm.subqueryload(path[0])
-            for relation in path[1:]:
-                option = option.subqueryload(relation)
+        if include is None:
+            return query
+        for path in include.paths:
+            resource = include.resource
+            option = orm
+            for name in path:
+                relationship = resource.relationships[name]
+                option = self._get_loader(option, relationship)(name)
+                resource = relationship.resource
             query = query.options(option)
         return query
 
-    def _paginate(self, query, pagination):
-        if pagination is not None:
-            query = query.offset(pagination.offset).limit(pagination.limit)
+    def _get_loader(self, option, relationship):
+        strategy = relationship.loading_strategy
+        if strategy == 'auto':
+            strategy = 'selectin' if relationship.many else 'joined'
+        return getattr(option, strategy + 'load')
+
+    def _load_only_requested_fields(self, query, params):
+        resource = params.resource
+        columns = self._get_columns_to_load(resource, params.fields)
+        if columns is not None:
+            query = query.options(orm.load_only(*columns))
+        return self._load_only_requested_related_fields(
+            query,
+            resource,
+            params.include.tree,
+            params.fields,
+            path=()
+        )
+
+    def _load_only_requested_related_fields(
+        self,
+        query,
+        resource,
+        include,
+        fields,
+        path
+    ):
+        for name in include:
+            related_resource = resource.relationships[name].resource
+            related_path = path + (name,)
+            columns = self._get_columns_to_load(related_resource, fields)
+            if columns is not None:
+                option = orm.defaultload(related_path[0])
+                for relation in related_path[1:]:
+                    option = option.defaultload(relation)
+                query = query.options(option.load_only(*columns))
+            query = self._load_only_requested_related_fields(
+                query,
+                related_resource,
+                include[name],
+                fields,
+                related_path
+            )
+        return query
+
+    def _get_columns_to_load(self, resource, fields):
+        if resource.type not in fields:
+            return None
+        mapper = sqlalchemy.inspect(resource.model_class)
+        columns = set()
+        for prop in mapper.column_attrs:
+            if any(
+                column.primary_key or column.foreign_keys
+                for column in prop.columns
+            ):
+                columns.add(prop.key)
+        for name in fields[resource.type]:
+            if name in resource.relationships:
+                continue
+            if name not in mapper.column_attrs:
+                return None
+            columns.add(name)
+        return sorted(columns)
+
+    def _paginate(self, query, pagination, order_by=()):
+        if isinstance(pagination, CursorPagination):
+            query = self._paginate_by_cursor(query, pagination, order_by)
+        elif pagination is not None:
+            limit = pagination.limit
+            if not pagination.requires_count or pagination.approximate_count:
+                # One extra row tells whether there is a next page.
+                limit += 1
+            query = query.offset(pagination.offset).limit(limit)
         return query
 
+    def _paginate_by_cursor(self, query, pagination, order_by):
+        sort_key = self._get_sort_key(query, order_by)
+        backward = pagination.before is not None
+        if backward:
+            cursor, param = pagination.before, 'before'
+        else:
+            cursor, param = pagination.after, 'after'
+        if cursor is not None:
+            values = self._get_cursor_values(
+                [part.column for part in sort_key],
+                cursor,
+                param
+            )
+            query = query.filter(
+                self._follows_cursor(sort_key, values, backward)
+            )
+        query = query.order_by(None).order_by(*[
+            part.column.desc() if part.descending != backward
+            else part.column.asc()
+            for part in sort_key
+        ])
+        return query.limit(pagination.size + 1)
+
+    def _follows_cursor(self, sort_key, values, backward):
+        if len(set(part.descending for part in sort_key)) == 1:
+            key = sqlalchemy.tuple_(*[part.column for part in sort_key])
+            values = sqlalchemy.tuple_(*values)
+            if sort_key[0].descending != backward:
+                return key < values
+            return key > values
+        # Row values compare all columns in one direction, so a sort key
+        # with ascending and descending columns is compared column by
+        # column.
+        clause = None
+        for part, value in reversed(list(zip(sort_key, values))):
+            if part.descending != backward:
+                follows = part.column < value
+            else:
+                follows = part.column > value
+            if clause is not None:
+                follows = sqlalchemy.or_(
+                    follows,
+                    sqlalchemy.and_(part.column == value, clause)
+                )
+            clause = follows
+        return clause
+
+    def _get_cursor_values(self, columns, cursor, param):
+        try:
+            if len(cursor) != len(columns):
+                raise ValueError('invalid cursor')
+            values = [
+                self._get_cursor_value(column, value)
+                for column, value in zip(columns, cursor)
+            ]
+        except (ArithmeticError, TypeError, ValueError):
+            raise errors.InvalidPageValue(
+                param=param,
+                detail='{} must be a valid cursor'.format(param)
+            )
+        return [
+            sqlalchemy.literal(value, type_=column.type)
+            for column, value in zip(columns, values)
+        ]
+
+    def _get_cursor_value(self, column, value):
+        if isinstance(value, (list, dict)):
+            raise TypeError('invalid cursor value')
+        if value is None:
+            raise ValueError('invalid cursor value')
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return value
+        if (python_type is bool) != isinstance(value, bool):
+            raise TypeError('invalid cursor value')
+        if isinstance(value, python_type):
+            return value
+        if python_type in CURSOR_TIME_FORMATS:
+            return self._parse_cursor_time(python_type, value)
+        coerced = python_type(value)
+        if isinstance(value, float) and coerced != value:
+            raise ValueError('invalid cursor value')
+        return coerced
+
+    def _parse_cursor_time(self, python_type, value):
+        if not isinstance(value, _compat.string_types):
+            raise TypeError('invalid cursor value')
+        for format in CURSOR_TIME_FORMATS[python_type]:
+            try:
+                parsed = datetime.datetime.strptime(value, format)
+            except ValueError:
+                continue
+            if python_type is datetime.date:
+                return parsed.date()
+            if python_type is datetime.time:
+                return parsed.time()
+            return parsed
+        raise ValueError('invalid cursor value')
+
+    def _get_cursor_page(self, query, instances, pagination, order_by):
+        keys = [part.key for part in self._get_sort_key(query, order_by)]
+        has_more = len(instances) > pagination.size
+        instances = instances[:pagination.size]
+        if pagination.before is not None:
+            instances.reverse()
+        if instances:
+            pagination.set_page(
+                first_key=[getattr(instances[0], key) for key in keys],
+                last_key=[getattr(instances[-1], key) for key in keys],
+                has_more=has_more
+            )
+        return instances
+
+    def _get_sort_key(self, query, order_by):
+        mapper = sqlalchemy.inspect(query.column_descriptions[0]['entity'])
+        sort_key = [
+            self._get_sort_key_part(mapper, clause) for clause in order_by
+        ]
+        keys = set(part.key for part in sort_key)
+        for column in mapper.primary_key:
+            part = self._get_sort_key_part(mapper, column)
+            if part.key not in keys:
+                sort_key.append(part)
+        return sort_key
+
+    def _get_sort_key_part(self, mapper, clause):
+        # The cursor holds a value of each column, so the order must be
+        # made of mapped columns. NULL values cannot be compared with it.
+        column = clause
+        descending = False
+        if isinstance(clause, UnaryExpression) and clause.modifier in (
+            operators.asc_op,
+            operators.desc_op
+        ):
+            column = clause.element
+            descending = clause.modifier is operators.desc_op
+        try:
+            key = mapper.get_property_by_column(column).key
+        except orm.exc.UnmappedColumnError:
+            raise exceptions.InvalidSortKey(mapper.class_, clause)
+        if getattr(column, 'nullable', True):
+            raise exceptions.InvalidSortKey(mapper.class_, clause)
+        return SortKeyPart(column=column, key=key, descending=descending)
+
     def create(self, model_class, id, fields):
         if id is not None and self._exists(model_class, id):
             raise exceptions.ObjectAlreadyExists
         instance = model_class(id=id, **fields)
         self.session.add(instance)
-        self.session.commit()
+        self._commit(model_class)
         return instance
 
     def update(self, instance, fields):
         for name, value in fields.items():
             setattr(instance, name, value)
+        self._commit(instance.__class__)
+
+    def update_by_id(self, model_class, id, fields):
+        mapper = sqlalchemy.inspect(model_class)
+        values = self._get_column_values(mapper, fields)
+        if values is None or self._has_update_hooks(mapper) or (
+            self.write_listeners and
+            any(name in mapper.relationships for name in fields)
+        ):
+            # Fields that cannot be written as column values, such as
+            # to-many relationships, need the object to be loaded. So do
+            # relationship changes that are reported to write listeners, as
+            # the previous related objects are only known from the object.
+            try:
+                instance = self.fetch_one(model_class, id)
+            except exceptions.ObjectNotFound:
+                return False
+            self.update(instance, fields)
+            return True
+        if not values:
+            return self._exists(model_class, id)
+        statement = mapper.local_table.update().where(
+            mapper.primary_key[0] == id
+        ).values(values)
+        result = self.session.execute(statement, mapper=mapper)
+        self._commit(model_class, touched=[(model_class, id)])
+        return result.rowcount > 0
+
+    def _get_column_values(self, mapper, fields):
+        values = {}
+        for name, value in fields.items():
+            if name in mapper.column_attrs:
+                columns = mapper.column_attrs[name].columns
+                if len(columns) != 1:
+                    return None
+                values[columns[0]] = value
+                continue
+            if name not in mapper.relationships:
+                return None
+            prop = mapper.relationships[name]
+            if prop.direction is not orm.interfaces.MANYTOONE:
+                return None
+            if prop.secondary is not None:
+                return None
+            for local, remote in prop.local_remote_pairs:
+                if value is None:
+                    values[local] = None
+                else:
+                    key = prop.mapper.get_property_by_column(remote).key
+                    values[local] = getattr(value, key)
+        return values
+
+    def _has_update_hooks(self, mapper):
+        # Validators, mapper events and version counters only run when the
+        # ORM flushes the object, and an UPDATE statement would skip them.
+        return bool(
+            mapper.validators or
+            mapper.version_id_col is not None or
+            mapper.dispatch.before_update or
+            mapper.dispatch.after_update
+        )
+
+    def _commit(self, model_class, touched=()):
+        if not self.write_listeners:
+            self.session.commit()
+            self._invalidate_counts(model_class)
+            return
+        instances, touched, resized = self._collect_changes(touched)
         self.session.commit()
+        self._invalidate_counts(model_class)
+        for instance in instances:
+            identity = sqlalchemy.inspect(instance).identity
+            if identity is not None:
+                touched.add((instance.__class__, str(identity[0])))
+        for listener in self.write_listeners:
+            listener(touched, resized)
+
+    def _collect_changes(self, touched):
+        # The changes are collected before the commit, while the history of
+        # the changed objects is still available. Objects that are only
+        # inserted by the flush get their identity after the commit.
+        session = self.session
+        instances = []
+        touched = {(model_class, str(id)) for model_class, id in touched}
+        resized = set()
+        for instance in itertools.chain(session.new, session.deleted):
+            instances.append(instance)
+            resized.add(instance.__class__)
+        instances.extend(
+            instance for instance in session.dirty
+            if session.is_modified(instance)
+        )
+        related = []
+        for instance in instances:
+            state = sqlalchemy.inspect(instance)
+            # The related objects of a deleted object lose it from their
+            # relationships, so they are touched as well.
+            deleted = instance in session.deleted
+            for relationship_property in state.mapper.relationships:
+                history = state.attrs[relationship_property.key].history
+                if deleted:
+                    related.extend(history.sum())
+                else:
+                    related.extend(history.added or ())
+                    related.extend(history.deleted or ())
+                info = self.get_relationship_info(
+                    instance.__class__,
+                    relationship_property.key
+                )
+                if info.foreign_key is None:
+                    continue
+                # The foreign key is only synchronized by the flush, so until
+                # then it still refers to the previous related object, which
+                # may not have been loaded.
+                foreign_key_history = state.attrs[info.foreign_key].history
+                if (
+                    deleted or
+                    history.has_changes() or
+                    foreign_key_history.has_changes()
+                ):
+                    touched.update(
+                        (info.model_class, str(id))
+                        for id in foreign_key_history.sum()
+                        if id is not None
+                    )
+        instances.extend(
+            instance for instance in related
+            if instance is not None
+        )
+        return instances, touched, resized
 
     def _exists(self, model_class, id):
         query = self.session.query(model_class).filter_by(id=id)
@@ -108,13 +872,13 @@ class SQLAlchemyStore(object):
 
     def delete(self, instance):
         self.session.delete(instance)
-        self.session.commit()
+        self._commit(instance.__class__)
 
     def create_relationship(self, instance, relationship, values):
         collection = getattr(instance, relationship)
         for value in values:
             collection.append(value)
-        self.session.commit()
+        self._commit(instance.__class__)
 
     def delete_relationship(self, instance, relationship, values):
         collection = getattr(instance, relationship)
@@ -123,11 +887,11 @@ class SQLAlchemyStore(object):
                 collection.remove(value)
             except ValueError:
                 pass
-        self.session.commit()
+        self._commit(instance.__class__)
 
     def get_related_model_class(self, model_class, relationship):
-        prop = self._get_relationship_property(model_class, relationship)
-        return prop.mapper.class_
+        info = self.get_relationship_info(model_class, relationship)
+        return info.model_class
 
     def get_attribute(self, instance, attribute):
         return getattr(instance, attribute)
@@ -135,16 +899,50 @@ class SQLAlchemyStore(object):
     def get_id(self, instance):
         return str(instance.id)
 
+    def has_scoped_session(self):
+        return isinstance(self.session, orm.scoped_session)
+
     def is_to_many_relationship(self, model_class, relationship):
-        mapper = sqlalchemy.inspect(model_class)
-        return mapper.relationships[relationship].uselist
+        return self.get_relationship_info(model_class, relationship).uselist
 
     def validate_relationship(self, model_class, relationship):
-        self._get_relationship_property(model_class, relationship)
+        self.get_relationship_info(model_class, relationship)
 
-    def _get_relationship_property(self, model_class, relationship):
-        mapper = sqlalchemy.inspect(model_class)
+    def get_relationship_info(self, model_class, relationship):
+        key = (model_class, relationship)
         try:
-            return mapper.relationships[relationship]
+            return self._relationship_info[key]
         except KeyError:
-            raise exceptions.InvalidRelationship(model_class, relationship)
+            mapper = sqlalchemy.inspect(model_class)
+            try:
+                prop = mapper.relationships[relationship]
+            except KeyError:
+                raise exceptions.InvalidRelationship(model_class, relationship)
+            info = self._relationship_info[key] = RelationshipInfo(
+                property=prop,
+                model_class=prop.mapper.class_,
+                uselist=prop.uselist,
+                direction=prop.direction,
+                local_remote_pairs=tuple(prop.local_remote_pairs),
+                foreign_key=self._get_foreign_key(mapper, prop)
+            )
+            return info
+
+    def _get_foreign_key(self, mapper, prop):
+        if (
+            prop.direction is not orm.interfaces.MANYTOONE or
+            prop.secondary is not None or
+            len(prop.local_remote_pairs) != 1 or
+            not isinstance(prop.primaryjoin, BinaryExpression)
+        ):
+            return None
+        local, remote = prop.local_remote_pairs[0]
+        try:
+            if prop.mapper.get_property_by_column(remote).key != 'id':
+                return None
+            return mapper.get_property_by_column(local).key
+        except orm.exc.UnmappedColumnError:
+            return None
+
+    def _get_relationship_property(self, model_class, relationship):
+        return self.get_relationship_info(model_class, relationship).property
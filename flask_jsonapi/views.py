@@ -10,7 +10,8 @@ controller = LocalProxy(lambda: current_app.extensions['jsonapi'].controller)
 
 @blueprint.after_request
 def set_response_content_type(response):
-    response.mimetype = 'application/vnd.api+json'
+    if response.mimetype != 'application/x-ndjson':
+        response.mimetype = 'application/vnd.api+json'
     return response
 
 
@@ -24,6 +25,11 @@ def fetch(type):
     return controller.fetch(type)
 
 
+@blueprint.route('/<type>.ndjson', methods=['GET'])
+def export(type):
+    return controller.export(type)
+
+
 @blueprint.route('/<type>/<id>', methods=['GET'])
 def fetch_one(type, id):
     return controller.fetch_one(type, id)
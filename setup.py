@@ -28,12 +28,13 @@ setup(
     install_requires=[
         'Flask',
         'Flask-SQLAlchemy',
-        'SQLAlchemy>=1.0',
+        'SQLAlchemy>=1.2',
         'qstring>=0.2.0,<0.3.0',
     ],
     extras_require={
         'tests': [
             'bunch',
+            'futures; python_version < "3"',
             'psycopg2',
             'sqlalchemy_json_api',
             'voluptuous',
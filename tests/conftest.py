@@ -70,10 +70,16 @@ def controller_class():
 
 
 @pytest.fixture
-def jsonapi(app, controller_class, db, models):
+def controller_options():
+    return {}
+
+
+@pytest.fixture
+def jsonapi(app, controller_class, controller_options, db, models):
     jsonapi = JSONAPI(
         app,
-        controller_class=import_string(controller_class)
+        controller_class=import_string(controller_class),
+        controller_options=controller_options
     )
 
     series = Resource(
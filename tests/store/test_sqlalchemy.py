@@ -1,7 +1,16 @@
+from datetime import date
+
 import pytest
+import sqlalchemy
 from flask_sqlalchemy import get_debug_queries
 
 from flask_jsonapi import exceptions
+from flask_jsonapi.cache import LocalCache
+from flask_jsonapi.paginator import (
+    CursorPaginator,
+    PagedPaginator,
+    encode_cursor
+)
 from flask_jsonapi.params import Parameters
 from flask_jsonapi.store.sqlalchemy import SQLAlchemyStore
 
@@ -34,6 +43,68 @@ class TestSQLAlchemyRepository(object):
         queries_after = len(get_debug_queries())
         assert queries_after - queries_before == 0
 
+    def test_iter_fetch_yields_all_models(
+        self, resource_registry, fantasy_database, store, models
+    ):
+        params = Parameters(resource_registry, 'books', {})
+        books = store.iter_fetch(models.Book, params, batch_size=2)
+        assert len(list(books)) == 11
+
+    @pytest.mark.parametrize(
+        'loading_strategy',
+        ['auto', 'joined', 'selectin', 'subquery']
+    )
+    def test_fetch_loads_included_relations_with_loading_strategy(
+        self, fantasy_database, resource_registry, store, models,
+        loading_strategy
+    ):
+        books = resource_registry.by_type['books']
+        authors = resource_registry.by_type['authors']
+        books.relationships['author'].loading_strategy = loading_strategy
+        books.relationships['chapters'].loading_strategy = loading_strategy
+        authors.relationships['books'].loading_strategy = loading_strategy
+        params = Parameters(
+            resource_registry,
+            'books',
+            {'include': 'author.books,chapters'}
+        )
+        books = store.fetch(models.Book, params)
+        queries_before = len(get_debug_queries())
+        for book in books:
+            book.author.books
+            book.chapters
+        queries_after = len(get_debug_queries())
+        assert len(books) == 11
+        assert queries_after - queries_before == 0
+
+    def test_fetch_loads_only_requested_columns(
+        self, resource_registry, fantasy_database, store, models
+    ):
+        params = Parameters(
+            resource_registry,
+            'books',
+            {'fields': {'books': 'title,author'}}
+        )
+        book = store.fetch(models.Book, params)[0]
+        assert 'title' in book.__dict__
+        assert 'id' in book.__dict__
+        assert 'author_id' in book.__dict__
+        assert 'date_published' not in book.__dict__
+
+    def test_fetch_loads_only_requested_columns_of_included_relations(
+        self, resource_registry, fantasy_database, store, models
+    ):
+        params = Parameters(
+            resource_registry,
+            'books',
+            {'include': 'author', 'fields': {'authors': 'name'}}
+        )
+        book = store.fetch(models.Book, params)[0]
+        author = book.__dict__['author']
+        assert 'date_published' in book.__dict__
+        assert 'name' in author.__dict__
+        assert 'date_of_birth' not in author.__dict__
+
     def test_fetch_first_page(self, resource_registry, fantasy_database, store, models):
         params = Parameters(
             resource_registry,
@@ -52,6 +123,104 @@ class TestSQLAlchemyRepository(object):
         books = store.fetch(models.Book, params)
         assert len(books) == 1
 
+    def test_fetch_without_count_detects_next_page(
+        self, resource_registry, fantasy_database, store, models
+    ):
+        resource_registry.by_type['books'].paginator = PagedPaginator(
+            count=False
+        )
+        params = Parameters(
+            resource_registry,
+            'books',
+            {'page': {'number': '2', 'size': '5'}}
+        )
+        books, count = store.fetch_with_count(models.Book, params)
+        assert [book.id for book in books] == [6, 7, 8, 9, 10]
+        assert count is None
+        assert params.pagination.has_next() is True
+
+    def test_iter_fetch_without_count_detects_last_page(
+        self, resource_registry, fantasy_database, store, models
+    ):
+        resource_registry.by_type['books'].paginator = PagedPaginator(
+            count=False
+        )
+        params = Parameters(
+            resource_registry,
+            'books',
+            {'page': {'number': '3', 'size': '5'}}
+        )
+        books = list(store.iter_fetch(models.Book, params, batch_size=2))
+        assert [book.id for book in books] == [11]
+        assert params.pagination.has_next() is False
+
+    def test_fetch_page_before_cursor(
+        self, resource_registry, fantasy_database, store, models
+    ):
+        resource_registry.by_type['books'].paginator = CursorPaginator()
+        params = Parameters(
+            resource_registry,
+            'books',
+            {'page': {'before': encode_cursor([8]), 'size': '3'}}
+        )
+        books = store.fetch(models.Book, params)
+        assert [book.id for book in books] == [5, 6, 7]
+        assert params.pagination.has_prev() is True
+        assert params.pagination.has_next() is True
+
+    def test_fetch_related_page_after_cursor(
+        self, resource_registry, fantasy_database, store, models
+    ):
+        resource_registry.by_type['chapters'].paginator = CursorPaginator()
+        params = Parameters(
+            resource_registry,
+            'chapters',
+            {'page': {'after': encode_cursor([20, 20]), 'size': '5'}}
+        )
+        book = models.Book.query.get(1)
+        chapters = store.fetch_related(book, 'chapters', params)
+        assert [chapter.ordering for chapter in chapters] == [21, 22]
+        assert params.pagination.has_next() is False
+
+    @pytest.mark.parametrize(('page', 'orderings'), [
+        ({'size': '3'}, [22, 21, 20]),
+        ({'after': encode_cursor([3, 3]), 'size': '5'}, [2, 1]),
+        ({'before': encode_cursor([20, 20]), 'size': '2'}, [22, 21]),
+    ])
+    def test_fetch_related_page_in_descending_order(
+        self, resource_registry, fantasy_database, store, models, monkeypatch,
+        page, orderings
+    ):
+        monkeypatch.setattr(
+            sqlalchemy.inspect(models.Book).relationships['chapters'],
+            'order_by',
+            (models.Chapter.ordering.desc(),)
+        )
+        resource_registry.by_type['chapters'].paginator = CursorPaginator()
+        params = Parameters(resource_registry, 'chapters', {'page': page})
+        book = models.Book.query.get(1)
+        chapters = store.fetch_related(book, 'chapters', params)
+        assert [chapter.ordering for chapter in chapters] == orderings
+
+    @pytest.mark.parametrize('order_by', [
+        lambda models: models.Book.title,
+        lambda models: sqlalchemy.func.lower(models.Book.title),
+    ])
+    def test_fetch_related_page_by_invalid_sort_key(
+        self, resource_registry, fantasy_database, store, models, monkeypatch,
+        order_by
+    ):
+        monkeypatch.setattr(
+            sqlalchemy.inspect(models.Author).relationships['books'],
+            'order_by',
+            (order_by(models),)
+        )
+        resource_registry.by_type['books'].paginator = CursorPaginator()
+        params = Parameters(resource_registry, 'books', {})
+        author = models.Author.query.get(1)
+        with pytest.raises(exceptions.InvalidSortKey):
+            store.fetch_related(author, 'books', params)
+
     def test_fetch_one_returns_requested_model(
         self, resource_registry, fantasy_database, store, models
     ):
@@ -67,6 +236,38 @@ class TestSQLAlchemyRepository(object):
         with pytest.raises(exceptions.ObjectNotFound):
             store.fetch_one(models.Book, '123123', params)
 
+    def test_fetch_version_returns_attribute_of_model(
+        self, fantasy_database, store, models
+    ):
+        title = store.fetch_version(models.Book, '1', 'title')
+        assert title == 'The Fellowship of the Ring'
+
+    def test_fetch_version_raises_error_if_model_not_found(
+        self, fantasy_database, store, models
+    ):
+        with pytest.raises(exceptions.ObjectNotFound):
+            store.fetch_version(models.Book, '123123', 'title')
+
+    def test_fetch_many_returns_requested_models(
+        self, fantasy_database, store, models
+    ):
+        books = store.fetch_many(models.Book, ['3', '1', '123123', '1'])
+        assert {id: book.id for id, book in books.items()} == {'1': 1, '3': 3}
+
+    def test_fetch_many_maps_models_to_requested_ids(
+        self, fantasy_database, store, models
+    ):
+        books = store.fetch_many(models.Book, ['01', '1'])
+        assert books['01'] is books['1']
+        assert books['1'].id == 1
+
+    def test_fetch_many_without_ids_does_not_query(self, store, models):
+        assert store.fetch_many(models.Book, []) == {}
+
+    def test_has_scoped_session(self, store, db):
+        assert store.has_scoped_session()
+        assert not SQLAlchemyStore(db.session()).has_scoped_session()
+
     def test_fetch_one_loads_included_relations(
         self, resource_registry, store, fantasy_database, models
     ):
@@ -86,6 +287,64 @@ class TestSQLAlchemyRepository(object):
         count = store.count(model_class=models.Book)
         assert count == 11
 
+    @pytest.mark.parametrize('window_count', [False, True])
+    @pytest.mark.parametrize(('number', 'length'), [('1', 5), ('3', 1)])
+    def test_fetch_with_count(
+        self, resource_registry, fantasy_database, db, models,
+        window_count, number, length
+    ):
+        store = SQLAlchemyStore(db.session, window_count=window_count)
+        params = Parameters(
+            resource_registry,
+            'books',
+            {'page': {'number': number, 'size': '5'}, 'include': 'author'}
+        )
+        books, count = store.fetch_with_count(models.Book, params)
+        assert len(books) == length
+        assert all(isinstance(book, models.Book) for book in books)
+        assert count == 11
+
+    def test_fetch_with_window_count_uses_a_single_query(
+        self, resource_registry, fantasy_database, db, models
+    ):
+        store = SQLAlchemyStore(db.session, window_count=True)
+        params = Parameters(resource_registry, 'books', {})
+        queries_before = len(get_debug_queries())
+        store.fetch_with_count(models.Book, params)
+        queries_after = len(get_debug_queries())
+        assert queries_after - queries_before == 1
+
+    @pytest.mark.parametrize('window_count', [False, True])
+    def test_fetch_with_count_past_the_last_page(
+        self, resource_registry, fantasy_database, db, models, window_count
+    ):
+        store = SQLAlchemyStore(db.session, window_count=window_count)
+        params = Parameters(
+            resource_registry,
+            'books',
+            {'page': {'number': '4', 'size': '5'}}
+        )
+        assert store.fetch_with_count(models.Book, params) == ([], 11)
+
+    @pytest.mark.parametrize('window_count', [False, True])
+    def test_fetch_related_with_count(
+        self, resource_registry, fantasy_database, db, models, window_count
+    ):
+        store = SQLAlchemyStore(db.session, window_count=window_count)
+        params = Parameters(
+            resource_registry,
+            'chapters',
+            {'page': {'number': '2', 'size': '20'}}
+        )
+        book = models.Book.query.get(1)
+        chapters, count = store.fetch_related_with_count(
+            book,
+            'chapters',
+            params
+        )
+        assert [chapter.ordering for chapter in chapters] == [21, 22]
+        assert count == 22
+
     def test_fetch_related_to_one_relation(self, resource_registry, fantasy_database, store, models):
         params = Parameters(resource_registry, 'authors', {})
         book = models.Book.query.get(11)
@@ -138,6 +397,106 @@ class TestSQLAlchemyRepository(object):
         books = store.fetch_related(book_store, 'books', params)
         assert books == []
 
+    def test_update_by_id_updates_columns(
+        self, fantasy_database, store, models, db
+    ):
+        author = models.Author.query.get(2)
+        updated = store.update_by_id(
+            models.Book,
+            '1',
+            {'title': 'Silmarillion', 'author': author, 'series': None}
+        )
+        assert updated is True
+        book = models.Book.query.get(1)
+        assert book.title == 'Silmarillion'
+        assert book.author_id == 2
+        assert book.series_id is None
+
+    def test_update_by_id_updates_to_many_relationships(
+        self, fantasy_database, store, models
+    ):
+        book_store = models.Store.query.get(1)
+        updated = store.update_by_id(
+            models.Book,
+            '2',
+            {'stores': [book_store]}
+        )
+        assert updated is True
+        assert models.Book.query.get(2).stores == [book_store]
+
+    def test_update_by_id_sets_other_attributes(
+        self, fantasy_database, store, models, monkeypatch
+    ):
+        def set_name(book, name):
+            book.title = name.upper()
+
+        monkeypatch.setattr(
+            models.Book,
+            'name',
+            property(None, set_name),
+            raising=False
+        )
+        assert store.update_by_id(models.Book, '1', {'name': 'foo'}) is True
+        assert models.Book.query.get(1).title == 'FOO'
+
+    def test_update_by_id_runs_mapper_events(
+        self, fantasy_database, store, models
+    ):
+        updated = []
+
+        def before_update(mapper, connection, target):
+            updated.append(target.id)
+
+        sqlalchemy.event.listen(models.Book, 'before_update', before_update)
+        try:
+            store.update_by_id(models.Book, '1', {'title': 'Foo'})
+        finally:
+            sqlalchemy.event.remove(
+                models.Book,
+                'before_update',
+                before_update
+            )
+        assert updated == [1]
+
+    def test_update_by_id_returns_false_if_model_not_found(
+        self, fantasy_database, store, models
+    ):
+        assert store.update_by_id(models.Book, '123123', {'title': 'x'}) is (
+            False
+        )
+
+    def test_approximate_count_falls_back_to_exact_count(
+        self, fantasy_database, store, models
+    ):
+        assert store.count(models.Book, approximate=True) == 11
+
+    def test_approximate_count_related_uses_query_plan(
+        self, fantasy_database, store, models
+    ):
+        book = store.fetch_one(models.Book, '1')
+        queries = []
+        sqlalchemy.event.listen(
+            store.session.get_bind(),
+            'before_cursor_execute',
+            lambda *args: queries.append(args[2])
+        )
+        count = store.count_related(book, 'chapters', approximate=True)
+        assert count >= 0
+        assert queries[0].startswith('EXPLAIN')
+
+    def test_relationship_info(self, models, store):
+        info = store.get_relationship_info(models.Book, 'author')
+        assert info.model_class is models.Author
+        assert info.uselist is False
+        assert [
+            (local.name, remote.name)
+            for local, remote in info.local_remote_pairs
+        ] == [('author_id', 'id')]
+
+    def test_relationship_info_is_cached(self, models, store):
+        info = store.get_relationship_info(models.Book, 'chapters')
+        assert store.get_relationship_info(models.Book, 'chapters') is info
+
     def test_validate_relationship_with_random_relationship_name(
         self, models, store
     ):
@@ -163,3 +522,113 @@ class TestSQLAlchemyRepository(object):
         self, models, store
     ):
         store.validate_relationship(models.Book, 'author')
+
+
+class TestCountCache(object):
+    @pytest.fixture
+    def store(self, db):
+        return SQLAlchemyStore(db.session, count_cache=LocalCache())
+
+    def test_count_is_cached(self, fantasy_database, store, models):
+        assert store.count(models.Book) == 11
+        queries_before = len(get_debug_queries())
+        assert store.count(models.Book) == 11
+        queries_after = len(get_debug_queries())
+        assert queries_after - queries_before == 0
+
+    def test_create_invalidates_count(self, fantasy_database, store, models):
+        author = store.fetch_one(models.Author, '1')
+        store.count(models.Book)
+        store.count_related(author, 'books')
+        store.create(
+            models.Book,
+            None,
+            {'title': 'Foo', 'date_published': date(2015, 1, 1),
+             'author': author}
+        )
+        assert store.count(models.Book) == 12
+        assert store.count_related(author, 'books') == 5
+
+    def test_delete_invalidates_related_count(
+        self, fantasy_database, store, models
+    ):
+        book = store.fetch_one(models.Book, '1')
+        store.count_related_by_id(models.Author, '1', 'books')
+        store.delete(book)
+        assert store.count_related_by_id(models.Author, '1', 'books') == 3
+
+    def test_create_relationship_invalidates_count(
+        self, fantasy_database, store, models
+    ):
+        store_ = store.fetch_one(models.Store, '1')
+        book = store.fetch_one(models.Book, '1')
+        assert store.count_related(store_, 'books') == 0
+        store.create_relationship(store_, 'books', [book])
+        assert store.count_related(store_, 'books') == 1
+
+    def test_delete_relationship_invalidates_count(
+        self, fantasy_database, store, models
+    ):
+        book = store.fetch_one(models.Book, '1')
+        count = store.count_related(book, 'stores')
+        store.delete_relationship(book, 'stores', list(book.stores))
+        assert count > 0
+        assert store.count_related(book, 'stores') == 0
+
+    def test_write_to_unrelated_table_keeps_count(
+        self, fantasy_database, store, models
+    ):
+        store.count(models.Author)
+        store.create(models.Store, None, {'name': 'Foo'})
+        queries_before = len(get_debug_queries())
+        store.count(models.Author)
+        queries_after = len(get_debug_queries())
+        assert queries_after - queries_before == 0
+
+
+class TestWriteListeners(object):
+    @pytest.fixture
+    def store(self, db):
+        return SQLAlchemyStore(db.session)
+
+    @pytest.fixture
+    def writes(self, store):
+        writes = []
+        store.write_listeners.append(
+            lambda touched, resized: writes.append((touched, resized))
+        )
+        return writes
+
+    def test_create_reports_created_and_related_objects(
+        self, fantasy_database, store, models, writes
+    ):
+        book = store.fetch_one(models.Book, '1')
+        chapter = store.create(
+            models.Chapter,
+            None,
+            {'title': 'Foo', 'ordering': 99, 'book': book}
+        )
+        touched, resized = writes[0]
+        assert (models.Chapter, str(chapter.id)) in touched
+        assert (models.Book, '1') in touched
+        assert resized == {models.Chapter}
+
+    def test_update_reports_previous_related_object(
+        self, fantasy_database, store, models, writes
+    ):
+        chapter = store.fetch_one(models.Chapter, '1')
+        book = store.fetch_one(models.Book, '2')
+        store.update(chapter, {'book': book})
+        touched, resized = writes[0]
+        assert touched >= {
+            (models.Chapter, '1'),
+            (models.Book, '1'),
+            (models.Book, '2')
+        }
+        assert resized == set()
+
+    def test_update_by_id_reports_updated_object(
+        self, fantasy_database, store, models, writes
+    ):
+        store.update_by_id(models.Book, '1', {'title': 'Foo'})
+        assert writes == [({(models.Book, '1')}, set())]
@@ -0,0 +1,190 @@
+import threading
+import time
+
+import pytest
+
+from flask_jsonapi.cache import LocalCache, ResponseCache, SingleFlight
+
+
+class Timer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for_waiters(flight, key, count):
+    while True:
+        call = flight._calls.get(key)
+        if call is not None and call.waiters == count:
+            return
+        time.sleep(0.001)
+
+
+class TestLocalCache(object):
+    def test_get_returns_none_for_missing_key(self):
+        cache = LocalCache()
+        assert cache.get('foo') is None
+
+    def test_get_returns_set_value(self):
+        cache = LocalCache()
+        cache.set('foo', 1)
+        assert cache.get('foo') == 1
+
+    def test_delete(self):
+        cache = LocalCache()
+        cache.set('foo', 1)
+        cache.delete('foo')
+        cache.delete('bar')
+        assert cache.get('foo') is None
+
+    def test_clear(self):
+        cache = LocalCache()
+        cache.set('foo', 1)
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used_key(self):
+        cache = LocalCache(max_size=2)
+        cache.set('foo', 1)
+        cache.set('bar', 2)
+        cache.get('foo')
+        cache.set('baz', 3)
+        assert cache.get('foo') == 1
+        assert cache.get('bar') is None
+        assert cache.get('baz') == 3
+
+    def test_expires_values_after_ttl(self):
+        timer = Timer()
+        cache = LocalCache(ttl=10, timer=timer)
+        cache.set('foo', 1)
+        timer.now = 9
+        assert cache.get('foo') == 1
+        timer.now = 10
+        assert cache.get('foo') is None
+
+    def test_ttl_can_be_overridden_per_value(self):
+        timer = Timer()
+        cache = LocalCache(ttl=10, timer=timer)
+        cache.set('foo', 1, ttl=20)
+        timer.now = 15
+        assert cache.get('foo') == 1
+
+    def test_evicts_least_recently_used_keys_over_max_bytes(self):
+        cache = LocalCache(max_bytes=10)
+        cache.set('foo', b'12345')
+        cache.set('bar', b'12345')
+        cache.get('foo')
+        cache.set('baz', b'1')
+        assert cache.get('bar') is None
+        assert cache.get('foo') == b'12345'
+        assert cache.bytes == 6
+
+
+class TestResponseCache(object):
+    @pytest.fixture
+    def cache(self):
+        return ResponseCache(LocalCache())
+
+    def test_get_returns_none_for_missing_key(self, cache):
+        assert cache.get('foo') is None
+
+    def test_get_returns_stored_response(self, cache):
+        cache.set('foo', 200, b'{}', {'books:1'}, cache.get_epoch())
+        assert cache.get('foo') == (200, b'{}')
+
+    def test_invalidate_evicts_responses_with_tag(self, cache):
+        cache.set('foo', 200, b'{}', {'books:1'}, cache.get_epoch())
+        cache.set('bar', 200, b'{}', {'books:2'}, cache.get_epoch())
+        cache.invalidate({'books:1'})
+        assert cache.get('foo') is None
+        assert cache.get('bar') == (200, b'{}')
+
+    def test_does_not_store_response_built_during_invalidation(self, cache):
+        epoch = cache.get_epoch()
+        cache.invalidate({'books:1'})
+        cache.set('foo', 200, b'{}', {'books:1'}, epoch)
+        assert cache.get('foo') is None
+
+    def test_does_not_store_response_if_invalidated_while_storing(
+        self, cache, monkeypatch
+    ):
+        epoch = cache.get_epoch()
+        get_generation = cache._get_generation
+
+        def invalidating_get_generation(tag):
+            cache.invalidate({tag})
+            return get_generation(tag)
+
+        monkeypatch.setattr(
+            cache,
+            '_get_generation',
+            invalidating_get_generation
+        )
+        cache.set('foo', 200, b'{}', {'books:1'}, epoch)
+        assert cache.get('foo') is None
+
+
+class TestSingleFlight(object):
+    @pytest.fixture
+    def flight(self):
+        return SingleFlight()
+
+    def test_do_returns_result_of_function(self, flight):
+        assert flight.do('foo', lambda: 'bar') == 'bar'
+
+    def test_sequential_calls_run_function_again(self, flight):
+        calls = []
+        flight.do('foo', lambda: calls.append(1))
+        flight.do('foo', lambda: calls.append(1))
+        assert len(calls) == 2
+
+    def test_concurrent_calls_share_result(self, flight):
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            release.wait()
+            return 'bar'
+
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(flight.do('foo', compute))
+            )
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        wait_for_waiters(flight, 'foo', 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert calls == [1]
+        assert results == ['bar', 'bar', 'bar']
+
+    def test_concurrent_calls_share_error(self, flight):
+        release = threading.Event()
+        errors = []
+
+        def compute():
+            release.wait()
+            raise ValueError('foo')
+
+        def call():
+            try:
+                flight.do('foo', compute)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        wait_for_waiters(flight, 'foo', 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 2
+        assert errors[0] is errors[1]
@@ -74,6 +74,23 @@ class TestResourceNotFound(object):
         )
 
 
+class TestPreconditionFailed(object):
+    @pytest.fixture
+    def error(self):
+        return errors.PreconditionFailed()
+
+    def test_status(self, error):
+        assert error.status == '412'
+
+    def test_title(self, error):
+        assert error.title == 'Precondition failed'
+
+    def test_detail(self, error):
+        assert error.detail == (
+            'The resource does not match the If-Match request header.'
+        )
+
+
 class TestRelationshipNotFound(object):
     @pytest.fixture
     def error(self):
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import pytest
+from flask import url_for
+
+from flask_jsonapi import link_builder
+
+IDS = ['1', 123, 'a.b_c~d-e', 'foo bar', 'a/b', 'ä?&#']
+
+
+@pytest.mark.parametrize('id', IDS)
+def test_build_individual_resource_url(jsonapi, id):
+    url = link_builder.build_individual_resource_url(type='books', id=id)
+    assert url == url_for(
+        'jsonapi.fetch_one',
+        type='books',
+        id=id,
+        _external=True
+    )
+
+
+@pytest.mark.parametrize('id', IDS)
+def test_build_related_url(jsonapi, id):
+    url = link_builder.build_related_url(
+        type='books',
+        id=id,
+        relationship='author'
+    )
+    assert url == url_for(
+        'jsonapi.fetch_related',
+        type='books',
+        id=id,
+        relationship='author',
+        _external=True
+    )
+
+
+@pytest.mark.parametrize('id', IDS)
+def test_build_relationship_url(jsonapi, id):
+    url = link_builder.build_relationship_url(
+        type='books',
+        id=id,
+        relationship='author'
+    )
+    assert url == url_for(
+        'jsonapi.fetch_relationship',
+        type='books',
+        id=id,
+        relationship='author',
+        _external=True
+    )
+
+
+def test_url_templates_are_built_once_per_endpoint(jsonapi, monkeypatch):
+    calls = []
+
+    def counting_url_for(*args, **kwargs):
+        calls.append(args)
+        return url_for(*args, **kwargs)
+
+    monkeypatch.setattr(link_builder, 'url_for', counting_url_for)
+    for id in range(10):
+        link_builder.build_individual_resource_url(type='books', id=id)
+        link_builder.build_related_url(
+            type='books',
+            id=id,
+            relationship='author'
+        )
+    assert len(calls) == 2
+
+
+def test_url_templates_are_built_per_url_root(app, jsonapi):
+    urls = []
+    for base_url in ('http://example.com', 'https://example.com/api'):
+        with app.test_request_context('/', base_url=base_url):
+            urls.append(
+                link_builder.build_individual_resource_url(
+                    type='books',
+                    id=1
+                )
+            )
+    assert urls == [
+        'http://example.com/books/1',
+        'https://example.com/api/books/1'
+    ]
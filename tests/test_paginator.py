@@ -2,10 +2,14 @@ import pytest
 
 from flask_jsonapi import errors
 from flask_jsonapi.paginator import (
+    CursorPagination,
+    CursorPaginator,
     OffsetPagination,
     OffsetPaginator,
     PagedPagination,
-    PagedPaginator
+    PagedPaginator,
+    decode_cursor,
+    encode_cursor
 )
 
 
@@ -139,6 +143,120 @@ class TestPagedPagination(object):
         }
 
 
+class TestCountFreePagination(object):
+    def test_does_not_require_count(self):
+        pagination = PagedPagination(number=1, size=25, count=False)
+        assert pagination.requires_count is False
+
+    def test_has_next_without_count(self):
+        pagination = OffsetPagination(offset=0, limit=25, count=False)
+        assert pagination.has_next() is False
+
+        pagination.set_has_more(True)
+        assert pagination.has_next() is True
+
+    def test_link_params_without_count(self):
+        pagination = PagedPagination(number=2, size=25, count=False)
+        pagination.set_has_more(True)
+        assert pagination.get_link_params() == {
+            'first': {
+                'number': 1,
+                'size': 25,
+            },
+            'last': None,
+            'prev': {
+                'number': 1,
+                'size': 25,
+            },
+            'next': {
+                'number': 3,
+                'size': 25,
+            },
+        }
+
+    def test_paginator_passes_options(self):
+        paginator = OffsetPaginator(count=False, estimate_total=True)
+        pagination = paginator.paginate({})
+        assert pagination.requires_count is False
+        assert pagination.estimate_total is True
+
+
+class TestApproximatePagination(object):
+    @pytest.fixture
+    def pagination(self):
+        pagination = PagedPagination(number=2, size=25)
+        pagination.approximate_count = True
+        return pagination
+
+    def test_last_is_after_next_page_if_there_are_more(self, pagination):
+        pagination.set_has_more(True)
+        link_params = pagination.get_link_params(count=30)
+        assert link_params['next'] == {'number': 3, 'size': 25}
+        assert link_params['last'] == {'number': 3, 'size': 25}
+
+    def test_last_is_current_page_if_there_are_no_more(self, pagination):
+        pagination.set_has_more(False)
+        link_params = pagination.get_link_params(count=1000)
+        assert link_params['next'] is None
+        assert link_params['last'] == {'number': 2, 'size': 25}
+
+    def test_uses_estimate_without_extra_row(self, pagination):
+        link_params = pagination.get_link_params(count=1000)
+        assert link_params['next'] == {'number': 3, 'size': 25}
+        assert link_params['last'] == {'number': 40, 'size': 25}
+
+
+class TestCursorPagination(object):
+    def test_does_not_require_count(self):
+        pagination = CursorPagination(size=25)
+        assert pagination.requires_count is False
+
+    def test_first_page(self):
+        pagination = CursorPagination(size=25)
+        pagination.set_page(first_key=[1], last_key=[25], has_more=True)
+        assert pagination.get_link_params() == {
+            'first': {'size': 25},
+            'last': None,
+            'prev': None,
+            'next': {'after': encode_cursor([25]), 'size': 25},
+        }
+
+    def test_last_page(self):
+        pagination = CursorPagination(size=25, after=[25])
+        pagination.set_page(first_key=[26], last_key=[40], has_more=False)
+        assert pagination.get_link_params() == {
+            'first': {'size': 25},
+            'last': None,
+            'prev': {'before': encode_cursor([26]), 'size': 25},
+            'next': None,
+        }
+
+    def test_page_before_cursor(self):
+        pagination = CursorPagination(size=25, before=[51])
+        pagination.set_page(first_key=[26], last_key=[50], has_more=True)
+        assert pagination.get_link_params() == {
+            'first': {'size': 25},
+            'last': None,
+            'prev': {'before': encode_cursor([26]), 'size': 25},
+            'next': {'after': encode_cursor([50]), 'size': 25},
+        }
+
+    def test_empty_page(self):
+        pagination = CursorPagination(size=25, after=[40])
+        assert pagination.get_link_params() == {
+            'first': {'size': 25},
+            'last': None,
+            'prev': None,
+            'next': None,
+        }
+
+    def test_cursor_round_trip(self):
+        assert decode_cursor(encode_cursor(['2015-01-01', 12])) == [
+            '2015-01-01',
+            12
+        ]
+
+
 class TestOffsetPaginator(object):
     def test_extra_parameters_raises_error(self):
         paginator = OffsetPaginator()
@@ -244,3 +362,49 @@ class TestPagedPaginator(object):
         paginator = PagedPaginator()
         with pytest.raises(errors.InvalidPageFormat):
             paginator.paginate('foobar')
+
+
+class TestCursorPaginator(object):
+    def test_extra_parameters_raises_error(self):
+        paginator = CursorPaginator()
+        with pytest.raises(errors.InvalidPageParameter) as exc_info:
+            paginator.paginate({'number': '1'})
+        assert exc_info.value.source_parameter == 'page[number]'
+
+    def test_defaults(self):
+        paginator = CursorPaginator()
+        pagination = paginator.paginate({})
+        assert pagination.size == 20
+        assert pagination.after is None
+        assert pagination.before is None
+
+    def test_decodes_cursor(self):
+        paginator = CursorPaginator()
+        pagination = paginator.paginate({'after': encode_cursor([5])})
+        assert pagination.after == [5]
+
+    def test_invalid_cursor_raises_error(self):
+        paginator = CursorPaginator()
+        with pytest.raises(errors.InvalidPageValue) as exc_info:
+            paginator.paginate({'before': 'foobar'})
+        assert exc_info.value.detail == 'before must be a valid cursor'
+        assert exc_info.value.source_parameter == 'page[before]'
+
+    def test_after_and_before_raises_error(self):
+        paginator = CursorPaginator()
+        with pytest.raises(errors.InvalidPageValue) as exc_info:
+            paginator.paginate({
+                'after': encode_cursor([5]),
+                'before': encode_cursor([10])
+            })
+        assert exc_info.value.detail == (
+            'before cannot be used together with after'
+        )
+
+    def test_too_high_size_raises_error(self):
+        paginator = CursorPaginator()
+        with pytest.raises(errors.InvalidPageValue) as exc_info:
+            paginator.paginate({'size': '101'})
+        assert exc_info.value.detail == (
+            'size cannot exceed maximum page size of 100'
+        )
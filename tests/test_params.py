@@ -56,6 +56,13 @@ class TestFieldsParameter(object):
         assert fields['books'] == {'title', 'date_published', 'author'}
         assert fields['authors'] == {'name'}
 
+    def test_returns_the_same_field_set_on_every_lookup(
+        self, resource_registry
+    ):
+        fields = FieldsParameter(resource_registry, fields={'authors': 'name'})
+        assert fields['authors'] is fields['authors']
+        assert fields['books'] is fields['books']
+
     def test___repr__(self, resource_registry):
         fields = FieldsParameter(resource_registry, fields={'authors': 'name'})
         assert repr(fields) == "<FieldsParameter {'authors': ['name']}>"
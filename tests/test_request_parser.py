@@ -1,6 +1,7 @@
 import datetime
 
 import pytest
+import sqlalchemy
 
 from flask_jsonapi import errors
 from flask_jsonapi.request_parser import RequestParser
@@ -422,6 +423,88 @@ class TestParseRelationshipObjectWithToManyRelationship(object):
         assert isinstance(chapters[0], models.Chapter)
         assert chapters[0].id == 1
 
+    def test_resolves_linkage_objects_with_one_query(
+        self,
+        parser,
+        relationship,
+        fantasy_database,
+        db
+    ):
+        queries = []
+        sqlalchemy.event.listen(
+            db.engine,
+            'before_cursor_execute',
+            lambda *args: queries.append(args[2])
+        )
+        chapters = parser.parse_relationship_object(
+            relationship=relationship,
+            data={
+                "data": [
+                    {'type': 'chapters', 'id': str(id)}
+                    for id in range(1, 11)
+                ]
+            },
+            path=[]
+        )
+        assert [chapter.id for chapter in chapters] == list(range(1, 11))
+        assert len(queries) == 1
+
+    def test_missing_linkage_object_raises_error(
+        self,
+        parser,
+        relationship,
+        fantasy_database
+    ):
+        with pytest.raises(errors.ResourceNotFound) as excinfo:
+            parser.parse_relationship_object(
+                relationship=relationship,
+                data={
+                    "data": [
+                        {'type': 'chapters', 'id': '1'},
+                        {'type': 'chapters', 'id': '123123'},
+                    ]
+                },
+                path=['data']
+            )
+        assert excinfo.value.source_pointer == '/data/data/1'
+
+    def test_missing_linkage_objects_can_be_ignored(
+        self,
+        parser,
+        relationship,
+        fantasy_database
+    ):
+        chapters = parser.parse_relationship_object(
+            relationship=relationship,
+            data={
+                "data": [
+                    {'type': 'chapters', 'id': '123123'},
+                    {'type': 'chapters', 'id': '2'},
+                ]
+            },
+            path=[],
+            ignore_not_found=True
+        )
+        assert [chapter.id for chapter in chapters] == [2]
+
+    def test_resolves_linkage_objects_with_equivalent_ids(
+        self,
+        parser,
+        relationship,
+        fantasy_database
+    ):
+        chapters = parser.parse_relationship_object(
+            relationship=relationship,
+            data={
+                "data": [
+                    {'type': 'chapters', 'id': '01'},
+                    {'type': 'chapters', 'id': '2'},
+                ]
+            },
+            path=[]
+        )
+        assert [chapter.id for chapter in chapters] == [1, 2]
+
 
 class TestParseResourceIdentifierObject(object):
     @pytest.fixture
@@ -35,6 +35,35 @@ class TestResource(object):
         resource = make_resource(paginator=paginator)
         assert resource.paginator is paginator
 
+    def test_etag_is_disabled_by_default(self, make_resource):
+        resource = make_resource()
+        assert resource.etag is False
+        assert resource.version_attribute is None
+
+    def test_loading_strategy_defaults_to_subquery(self, make_resource):
+        resource = make_resource()
+        assert resource.loading_strategy == 'subquery'
+
+    def test_cannot_have_invalid_loading_strategy(self, make_resource):
+        with pytest.raises(ValueError) as excinfo:
+            make_resource(loading_strategy='foobar')
+        assert str(excinfo.value) == (
+            'loading_strategy must be one of auto, joined, selectin, subquery'
+        )
+
+    def test_relationship_inherits_loading_strategy(self, make_resource):
+        resource = make_resource(
+            fields=[
+                Relationship('author'),
+                Relationship('chapters', loading_strategy='selectin')
+            ],
+            loading_strategy='auto'
+        )
+        assert resource.relationships['author'].loading_strategy == 'auto'
+        assert (
+            resource.relationships['chapters'].loading_strategy == 'selectin'
+        )
+
     def test_attribute_is_classified_correctly(self, make_resource):
         resource = make_resource(fields=[Attribute('title')])
         assert 'title' in resource.fields
@@ -152,6 +181,27 @@ class TestRelationship(object):
     def test_type(self, books_author):
         assert books_author.type == 'authors'
 
+    def test_resource_is_resolved_when_related_resource_is_registered(
+        self, db, models
+    ):
+        registry = ResourceRegistry()
+        books = Resource(
+            type='books',
+            model_class=models.Book,
+            store=SQLAlchemyStore(db.session),
+            fields=[Relationship('author')]
+        )
+        authors = Resource(
+            type='authors',
+            model_class=models.Author,
+            store=SQLAlchemyStore(db.session),
+            fields=[Relationship('books')]
+        )
+        registry.register(books)
+        registry.register(authors)
+        assert books.relationships['author'].resource is authors
+        assert authors.relationships['books'].resource is books
+
     def test___repr__(self, resource_registry):
         authors = resource_registry.by_type['authors']
         relationship = authors.relationships['books']
@@ -1,11 +1,17 @@
 from __future__ import unicode_literals
 
 import datetime
+import itertools
 
 import pytest
+from flask_sqlalchemy import get_debug_queries
 
 from flask_jsonapi.params import Parameters
-from flask_jsonapi.serializer import Serializer
+from flask_jsonapi.serializer import (
+    Serializer,
+    _plans,
+    get_serialization_plan
+)
 
 
 @pytest.fixture
@@ -1014,3 +1020,119 @@ def test_resource_collection(jsonapi, resource_registry, books, db):
     serializer = Serializer(resource_registry=resource_registry, params=params)
     data = serializer.dump(books)
     assert len(data['data']) == 11
+
+
+def test_serialization_plan_is_reused(resource_registry):
+    resource = resource_registry.by_type['books']
+    fields = frozenset(['title', 'author'])
+    plan = get_serialization_plan(resource, fields)
+    assert plan.attributes == ('title',)
+    assert [r.name for r in plan.relationships] == ['author']
+    assert get_serialization_plan(resource, frozenset(fields)) is plan
+
+
+def test_serialization_plans_are_bounded(resource_registry, monkeypatch):
+    monkeypatch.setattr('flask_jsonapi.serializer.PLAN_CACHE_SIZE', 10)
+    resource = resource_registry.by_type['books']
+    for size in range(len(resource.fields) + 1):
+        for fields in itertools.combinations(resource.fields, size):
+            get_serialization_plan(resource, frozenset(fields))
+    assert len(_plans[resource]) < 20
+
+
+def test_to_one_linkage_does_not_load_related_resources(
+    jsonapi, resource_registry, books, db
+):
+    params = Parameters(
+        resource_registry=resource_registry,
+        type='books',
+        params={'fields': {'books': 'author,series'}}
+    )
+    serializer = Serializer(resource_registry=resource_registry, params=params)
+    queries_before = len(get_debug_queries())
+    data = serializer.dump(books)
+    queries_after = len(get_debug_queries())
+    assert queries_after - queries_before == 0
+    relationships = data['data'][0]['relationships']
+    assert relationships['author']['data'] == {'type': 'authors', 'id': '1'}
+    assert relationships['series']['data'] == {'type': 'series', 'id': '1'}
+
+
+def test_to_many_linkage_is_loaded_with_one_query_per_relationship(
+    jsonapi, resource_registry, books, db
+):
+    params = Parameters(
+        resource_registry=resource_registry,
+        type='books',
+        params={'fields': {'books': 'chapters,stores'}}
+    )
+    serializer = Serializer(resource_registry=resource_registry, params=params)
+    queries_before = len(get_debug_queries())
+    data = serializer.dump(books)
+    queries_after = len(get_debug_queries())
+    assert queries_after - queries_before == 2
+    relationships = data['data'][10]['relationships']
+    assert relationships['stores']['data'] == [{'type': 'stores', 'id': '2'}]
+    assert len(relationships['chapters']['data']) == 19
+    assert relationships['chapters']['data'][0] == {
+        'type': 'chapters',
+        'id': '271'
+    }
+
+
+def test_identity_of_each_model_is_computed_once(
+    jsonapi, resource_registry, book, db, monkeypatch
+):
+    params = Parameters(
+        resource_registry=resource_registry,
+        type='books',
+        params={'include': 'author.books,chapters'}
+    )
+    serializer = Serializer(resource_registry=resource_registry, params=params)
+    models = []
+
+    def counting(get_id):
+        def counting_get_id(model):
+            models.append(model)
+            return get_id(model)
+        return counting_get_id
+
+    for resource in resource_registry.by_type.values():
+        monkeypatch.setattr(
+            resource.store,
+            'get_id',
+            counting(resource.store.get_id)
+        )
+    serializer.dump(book)
+    assert len(models) == len(set(map(id, models)))
+
+
+def test_models_shared_by_included_resources_are_traversed_once(
+    jsonapi, resource_registry, books, db, monkeypatch
+):
+    params = Parameters(
+        resource_registry=resource_registry,
+        type='books',
+        params={'include': 'chapters.book.author'}
+    )
+    serializer = Serializer(resource_registry=resource_registry, params=params)
+    calls = []
+
+    def counting(get_related):
+        def counting_get_related(model, relationship):
+            calls.append((id(model), relationship))
+            return get_related(model, relationship)
+        return counting_get_related
+
+    for resource in resource_registry.by_type.values():
+        monkeypatch.setattr(
+            resource.store,
+            'get_related',
+            counting(resource.store.get_related)
+        )
+    data = serializer.dump(books)
+    assert len(calls) == len(set(calls))
+    assert [
+        (resource_object['type'], resource_object['id'])
+        for resource_object in data['included'][:3]
+    ] == [('chapters', '1'), ('authors', '1'), ('chapters', '2')]
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture(params=[
+    'flask_jsonapi.controllers.default.DefaultController',
+    'flask_jsonapi.controllers.postgresql.PostgreSQLController',
+])
+def controller_class(request):
+    return request.param
+
+
+@pytest.fixture
+def controller_options():
+    return {'coalesce': True}
+
+
+class TestCoalescing(object):
+    @pytest.fixture
+    def release(self, jsonapi, monkeypatch):
+        controller = jsonapi.controller
+        build_params = controller._build_params
+        release = threading.Event()
+        release.calls = []
+
+        def blocking_build_params(type):
+            release.calls.append(type)
+            release.wait()
+            return build_params(type)
+
+        monkeypatch.setattr(
+            controller,
+            '_build_params',
+            blocking_build_params
+        )
+        return release
+
+    @pytest.fixture
+    def get_concurrently(self, app, jsonapi, fantasy_database, release):
+        flight = jsonapi.controller._single_flight
+
+        def get_concurrently(url, count):
+            responses = []
+
+            def get():
+                with app.test_client() as client:
+                    responses.append(client.get(url))
+
+            threads = [threading.Thread(target=get) for _ in range(count)]
+            for thread in threads:
+                thread.start()
+            while not any(
+                call.waiters == count - 1
+                for call in list(flight._calls.values())
+            ):
+                time.sleep(0.001)
+            release.set()
+            for thread in threads:
+                thread.join()
+            return responses
+
+        return get_concurrently
+
+    @pytest.mark.parametrize('url', ['/books?include=author', '/books/1'])
+    def test_identical_requests_share_document(
+        self, get_concurrently, release, url
+    ):
+        responses = get_concurrently(url, 3)
+        assert release.calls == ['books']
+        assert [response.status_code for response in responses] == [200] * 3
+        assert len(set(response.data for response in responses)) == 1
+        assert responses[0].mimetype == 'application/vnd.api+json'
+
+    def test_requests_share_error(self, get_concurrently, release):
+        responses = get_concurrently('/books/123123', 2)
+        assert release.calls == ['books']
+        assert [response.status_code for response in responses] == [404] * 2
+
+    def test_sequential_requests_are_not_coalesced(
+        self, client, fantasy_database, release
+    ):
+        release.set()
+        client.get('/books/1')
+        client.get('/books/1')
+        assert release.calls == ['books', 'books']
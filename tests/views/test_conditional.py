@@ -0,0 +1,200 @@
+import json
+
+import pytest
+import sqlalchemy
+
+
+@pytest.fixture(params=[
+    'flask_jsonapi.controllers.default.DefaultController',
+    'flask_jsonapi.controllers.postgresql.PostgreSQLController',
+])
+def controller_class(request):
+    return request.param
+
+
+@pytest.fixture
+def books(resource_registry):
+    books = resource_registry.by_type['books']
+    books.etag = True
+    return books
+
+
+@pytest.fixture
+def queries(db):
+    queries = []
+    sqlalchemy.event.listen(
+        db.engine,
+        'before_cursor_execute',
+        lambda *args: queries.append(args[2])
+    )
+    return queries
+
+
+def patch_title(client, title, **headers):
+    return client.patch(
+        '/books/1',
+        data=json.dumps({
+            'data': {
+                'type': 'books',
+                'id': '1',
+                'attributes': {'title': title}
+            }
+        }),
+        headers=headers
+    )
+
+
+class TestConditionalFetch(object):
+    def test_responses_have_no_etag_by_default(self, client, fantasy_database):
+        response = client.get('/books/1')
+        assert 'ETag' not in response.headers
+
+    @pytest.mark.parametrize('url', [
+        '/books?include=author',
+        '/books/1',
+        '/books/1/chapters',
+        '/books/1/relationships/stores',
+    ])
+    def test_returns_not_modified_if_etag_matches(
+        self, client, fantasy_database, books, url
+    ):
+        etag = client.get(url).headers['ETag']
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+
+    def test_returns_document_if_etag_does_not_match(
+        self, client, fantasy_database, books
+    ):
+        response = client.get('/books/1', headers={'If-None-Match': '"foo"'})
+        assert response.status_code == 200
+        assert response.json['data']['id'] == '1'
+
+    def test_etag_changes_when_resource_changes(
+        self, client, fantasy_database, books
+    ):
+        etag = client.get('/books/1').headers['ETag']
+        patch_title(client, 'Foo')
+        response = client.get('/books/1', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_missing_resource_is_not_found(
+        self, client, fantasy_database, books
+    ):
+        response = client.get(
+            '/books/123123',
+            headers={'If-None-Match': '"foo"'}
+        )
+        assert response.status_code == 404
+
+
+class TestVersionETag(object):
+    url = '/books/1?fields%5Bbooks%5D=title,author'
+
+    @pytest.fixture
+    def books(self, books):
+        books.version_attribute = 'title'
+        return books
+
+    def test_returns_not_modified_without_loading_resource(
+        self, client, fantasy_database, books, queries
+    ):
+        etag = client.get(self.url).headers['ETag']
+        del queries[:]
+        response = client.get(self.url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert len(queries) == 1
+
+    def test_etag_changes_when_version_changes(
+        self, client, fantasy_database, books
+    ):
+        etag = client.get(self.url).headers['ETag']
+        patch_title(client, 'Foo')
+        response = client.get(self.url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_included_resources_are_hashed(
+        self, client, fantasy_database, books
+    ):
+        etag = client.get(self.url).headers['ETag']
+        response = client.get(self.url + '&include=author')
+        assert response.headers['ETag'] != etag
+
+    def test_to_many_linkage_is_hashed(self, client, fantasy_database, books):
+        etag = client.get('/books/1').headers['ETag']
+        client.patch(
+            '/books/1/relationships/stores',
+            data=json.dumps({'data': []})
+        )
+        response = client.get('/books/1', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_invalid_parameters_are_rejected(
+        self, client, fantasy_database, books
+    ):
+        etag = client.get(self.url).headers['ETag']
+        response = client.get(
+            '/books/1?fields%5Bbooks%5D=bogus',
+            headers={'If-None-Match': etag}
+        )
+        assert response.status_code == 400
+        assert response.json['errors'][0]['code'] == 'InvalidField'
+
+    def test_updates_if_version_etag_matches(
+        self, client, fantasy_database, books
+    ):
+        etag = client.get(self.url).headers['ETag']
+        response = patch_title(client, 'Foo', **{'If-Match': etag})
+        assert response.status_code == 200
+
+
+class TestConditionalUpdate(object):
+    def test_updates_if_etag_matches(self, client, fantasy_database, books):
+        etag = client.get('/books/1').headers['ETag']
+        response = patch_title(client, 'Foo', **{'If-Match': etag})
+        assert response.status_code == 200
+        assert response.json['data']['attributes']['title'] == 'Foo'
+
+    def test_precondition_fails_if_etag_does_not_match(
+        self, client, fantasy_database, books
+    ):
+        etag = client.get('/books/1').headers['ETag']
+        patch_title(client, 'Foo')
+        response = patch_title(client, 'Bar', **{'If-Match': etag})
+        assert response.status_code == 412
+        assert response.json['errors'][0]['code'] == 'PreconditionFailed'
+        title = client.get('/books/1').json['data']['attributes']['title']
+        assert title == 'Foo'
+
+    def test_updates_with_version_etag(self, client, fantasy_database, books):
+        books.version_attribute = 'title'
+        etag = client.get('/books/1').headers['ETag']
+        first = patch_title(client, 'Foo', **{'If-Match': etag})
+        second = patch_title(client, 'Bar', **{'If-Match': etag})
+        assert first.status_code == 200
+        assert second.status_code == 412
+
+
+class TestConditionalDelete(object):
+    def test_deletes_if_etag_matches(self, client, fantasy_database, books):
+        etag = client.get('/books/1').headers['ETag']
+        response = client.delete('/books/1', headers={'If-Match': etag})
+        assert response.status_code == 204
+        assert client.get('/books/1').status_code == 404
+
+    def test_precondition_fails_if_etag_does_not_match(
+        self, client, fantasy_database, books
+    ):
+        response = client.delete('/books/1', headers={'If-Match': '"foo"'})
+        assert response.status_code == 412
+        assert client.get('/books/1').status_code == 200
+
+    def test_precondition_fails_if_resource_is_missing(
+        self, client, fantasy_database, books
+    ):
+        response = client.delete('/books/123123', headers={'If-Match': '*'})
+        assert response.status_code == 412
@@ -3,6 +3,14 @@ import json
 import pytest
 
 
+@pytest.fixture(params=[
+    'flask_jsonapi.controllers.default.DefaultController',
+    'flask_jsonapi.controllers.postgresql.PostgreSQLController',
+])
+def controller_class(request):
+    return request.param
+
+
 @pytest.fixture
 def data(fantasy_database):
     return {
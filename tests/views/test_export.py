@@ -0,0 +1,111 @@
+import json
+
+import pytest
+import sqlalchemy
+
+
+@pytest.fixture(params=[
+    'flask_jsonapi.controllers.default.DefaultController',
+    'flask_jsonapi.controllers.postgresql.PostgreSQLController',
+])
+def controller_class(request):
+    return request.param
+
+
+@pytest.fixture
+def controller_options():
+    return {'batch_size': 4}
+
+
+def parse_lines(response):
+    lines = response.data.decode('utf8').splitlines()
+    return [json.loads(line) for line in lines]
+
+
+class TestExport(object):
+    @pytest.fixture
+    def response(self, client, fantasy_database):
+        return client.get('/books.ndjson')
+
+    def test_responds_with_200_status_code(self, response):
+        assert response.status_code == 200
+
+    def test_responds_with_ndjson_content_type(self, response):
+        assert response.mimetype == 'application/x-ndjson'
+
+    def test_returns_every_resource_object_on_its_own_line(self, response):
+        resource_objects = parse_lines(response)
+        assert [book['id'] for book in resource_objects] == [
+            str(id) for id in range(1, 12)
+        ]
+
+    def test_returns_resource_objects_in_serializer_format(self, response):
+        book = parse_lines(response)[0]
+        assert book['type'] == 'books'
+        assert book['attributes']['title'] == 'The Fellowship of the Ring'
+        assert book['relationships']['author']['data'] == {
+            'type': 'authors',
+            'id': '1'
+        }
+        assert book['links']['self'] == 'http://example.com/books/1'
+
+    def test_does_not_count_resources(self, client, fantasy_database, db):
+        queries = []
+        sqlalchemy.event.listen(
+            db.engine,
+            'before_cursor_execute',
+            lambda *args: queries.append(args[2])
+        )
+        client.get('/books.ndjson')
+        assert not any('count(' in query for query in queries)
+
+
+class TestExportSparseFieldsets(object):
+    @pytest.fixture
+    def response(self, client, fantasy_database):
+        return client.get('/books.ndjson?fields%5Bbooks%5D=title')
+
+    def test_returns_only_requested_fields(self, response):
+        book = parse_lines(response)[0]
+        assert list(book['attributes'].keys()) == ['title']
+        assert 'relationships' not in book
+
+
+class TestExportWithInclude(object):
+    @pytest.fixture
+    def response(self, client, fantasy_database):
+        return client.get('/books.ndjson?include=author')
+
+    def test_responds_with_400_status_code(self, response):
+        assert response.status_code == 400
+
+    def test_returns_parameter_not_allowed_error(self, response):
+        error = response.json['errors'][0]
+        assert error['code'] == 'ParameterNotAllowed'
+        assert error['source']['parameter'] == 'include'
+
+
+class TestExportResourceTypeNotFound(object):
+    @pytest.fixture
+    def response(self, client):
+        return client.get('/foobars.ndjson')
+
+    def test_responds_with_404_status_code(self, response):
+        assert response.status_code == 404
+
+
+class TestResourceWithIdExport(object):
+    def test_is_fetched_as_individual_resource(
+        self, client, jsonapi, monkeypatch
+    ):
+        calls = []
+
+        def fetch_one(type, id):
+            calls.append((type, id))
+            return '{"data": null}'
+
+        monkeypatch.setattr(jsonapi.controller, 'fetch_one', fetch_one)
+        response = client.get('/books/export')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/vnd.api+json'
+        assert calls == [('books', 'export')]
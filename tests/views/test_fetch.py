@@ -1,4 +1,17 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
+import sqlalchemy
+
+from flask_jsonapi.controllers.postgresql import PostgreSQLController
+from flask_jsonapi.paginator import (
+    CursorPaginator,
+    PagedPaginator,
+    encode_cursor
+)
+from flask_jsonapi.resource import Attribute, Resource
+from flask_jsonapi.store.sqlalchemy import SQLAlchemyStore
 
 
 @pytest.fixture(params=[
@@ -112,6 +125,375 @@ class TestPagination(object):
         )
 
 
+class TestCursorPagination(object):
+    @pytest.fixture
+    def paginator(self, resource_registry):
+        paginator = CursorPaginator(default_page_size=5)
+        resource_registry.by_type['books'].paginator = paginator
+        return paginator
+
+    @pytest.fixture
+    def response(self, client, fantasy_database, paginator):
+        return client.get(
+            '/books?page%5Bafter%5D={cursor}'.format(
+                cursor=encode_cursor([5])
+            )
+        )
+
+    def test_responds_with_200_status_code(self, response):
+        assert response.status_code == 200
+
+    def test_returns_resource_objects_after_the_cursor(self, response):
+        data = response.json['data']
+        assert [book['id'] for book in data] == ['6', '7', '8', '9', '10']
+
+    def test_response_contains_prev_link(self, response):
+        prev_link = response.json['links']['prev']
+        assert prev_link == (
+            'http://example.com/books?page%5Bbefore%5D={cursor}&'
+            'page%5Bsize%5D=5'
+        ).format(cursor=encode_cursor([6]))
+
+    def test_response_contains_next_link(self, response):
+        next_link = response.json['links']['next']
+        assert next_link == (
+            'http://example.com/books?page%5Bafter%5D={cursor}&'
+            'page%5Bsize%5D=5'
+        ).format(cursor=encode_cursor([10]))
+
+    def test_response_does_not_contain_last_link(self, response):
+        assert response.json['links']['last'] is None
+
+    def test_does_not_count_resources(
+        self, client, fantasy_database, paginator, db
+    ):
+        queries = []
+        sqlalchemy.event.listen(
+            db.engine,
+            'before_cursor_execute',
+            lambda *args: queries.append(args[2])
+        )
+        client.get('/books')
+        assert not any('count(' in query for query in queries)
+
+    def test_follows_prev_link(self, client, response):
+        prev_response = client.get(response.json['links']['prev'])
+        data = prev_response.json['data']
+        assert [book['id'] for book in data] == ['1', '2', '3', '4', '5']
+        assert prev_response.json['links']['prev'] is None
+
+    def test_follows_next_link(self, client, response):
+        next_response = client.get(response.json['links']['next'])
+        data = next_response.json['data']
+        assert [book['id'] for book in data] == ['11']
+        assert next_response.json['links']['next'] is None
+
+    def test_invalid_cursor(self, client, fantasy_database, paginator):
+        response = client.get(
+            '/books?page%5Bafter%5D={cursor}'.format(
+                cursor=encode_cursor([5, 6])
+            )
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize('key', [
+        ['abc'],
+        [[5]],
+        [{'id': 5}],
+        [True],
+        [5.5],
+        [None],
+    ])
+    def test_cursor_with_invalid_value(
+        self, client, fantasy_database, paginator, key
+    ):
+        response = client.get(
+            '/books?page%5Bafter%5D={cursor}'.format(
+                cursor=encode_cursor(key)
+            )
+        )
+        assert response.status_code == 400
+        error = response.json['errors'][0]
+        assert error['code'] == 'InvalidPageValue'
+        assert error['source']['parameter'] == 'page[after]'
+        assert response.json['errors'][0]['code'] == 'InvalidPageValue'
+
+
+class TestCountFreePagination(object):
+    @pytest.fixture(params=[
+        'flask_jsonapi.controllers.default.DefaultController',
+        'flask_jsonapi.controllers.postgresql.PostgreSQLController',
+    ])
+    def controller_class(self, request):
+        return request.param
+
+    @pytest.fixture
+    def paginator(self, resource_registry, monkeypatch):
+        paginator = PagedPaginator(count=False, estimate_total=True)
+        books = resource_registry.by_type['books']
+        books.paginator = paginator
+        monkeypatch.setattr(
+            books.store,
+            'estimate_count',
+            lambda model_class: 11
+        )
+        return paginator
+
+    @pytest.fixture
+    def response(self, client, fantasy_database, paginator):
+        return client.get('/books?page%5Bnumber%5D=1&page%5Bsize%5D=5')
+
+    def test_responds_with_200_status_code(self, response):
+        assert response.status_code == 200
+
+    def test_returns_resource_objects_for_the_requested_page(self, response):
+        data = response.json['data']
+        assert [book['id'] for book in data] == ['1', '2', '3', '4', '5']
+
+    def test_response_contains_next_link(self, response):
+        next_link = response.json['links']['next']
+        assert next_link == (
+            'http://example.com/books?page%5Bnumber%5D=2&page%5Bsize%5D=5'
+        )
+
+    def test_response_does_not_contain_last_link(self, response):
+        assert response.json['links']['last'] is None
+
+    def test_does_not_count_resources(
+        self, client, fantasy_database, paginator, db
+    ):
+        queries = []
+        sqlalchemy.event.listen(
+            db.engine,
+            'before_cursor_execute',
+            lambda *args: queries.append(args[2])
+        )
+        client.get('/books')
+        assert not any('count(' in query for query in queries)
+
+    def test_response_contains_estimated_total(self, response):
+        assert response.json['meta'] == {'total': 11, 'approximate': True}
+
+
+class TestApproximateCount(object):
+    @pytest.fixture
+    def resource(self, resource_registry):
+        resource = resource_registry.by_type['books']
+        resource.approximate_count = True
+        return resource
+
+    @pytest.fixture
+    def response(self, client, fantasy_database, resource):
+        return client.get('/books?page%5Bnumber%5D=2&page%5Bsize%5D=5')
+
+    def test_responds_with_200_status_code(self, response):
+        assert response.status_code == 200
+
+    def test_returns_resource_objects_for_the_requested_page(self, response):
+        data = response.json['data']
+        assert [book['id'] for book in data] == ['6', '7', '8', '9', '10']
+
+    def test_response_contains_next_link(self, response):
+        next_link = response.json['links']['next']
+        assert next_link == (
+            'http://example.com/books?page%5Bnumber%5D=3&page%5Bsize%5D=5'
+        )
+
+    def test_response_contains_last_link(self, response):
+        assert response.json['links']['last'] is not None
+
+    def test_response_contains_approximate_total(self, response):
+        meta = response.json['meta']
+        assert meta['approximate'] is True
+        assert meta['total'] >= 0
+
+
+class TestConcurrentCount(object):
+    @pytest.fixture
+    def controller_class(self):
+        return 'flask_jsonapi.controllers.default.DefaultController'
+
+    @pytest.yield_fixture
+    def controller_options(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        yield {'executor': executor}
+        executor.shutdown()
+
+    @pytest.fixture
+    def queries(self, db):
+        queries = []
+        sqlalchemy.event.listen(
+            db.engine,
+            'before_cursor_execute',
+            lambda *args: queries.append(
+                (threading.current_thread(), args[2])
+            )
+        )
+        return queries
+
+    @pytest.fixture
+    def response(self, client, fantasy_database, queries):
+        return client.get('/books?page%5Bnumber%5D=3&page%5Bsize%5D=5')
+
+    def test_returns_resource_objects_for_the_requested_page(self, response):
+        assert [book['id'] for book in response.json['data']] == ['11']
+
+    def test_response_contains_last_link(self, response):
+        last_link = response.json['links']['last']
+        assert last_link == (
+            'http://example.com/books?page%5Bnumber%5D=3&page%5Bsize%5D=5'
+        )
+
+    def test_counts_in_another_thread(self, response, queries):
+        count_threads = [
+            thread for thread, query in queries if 'count(' in query
+        ]
+        assert count_threads
+        assert threading.current_thread() not in count_threads
+
+    def test_counts_related_resources_in_another_thread(
+        self, client, fantasy_database, queries
+    ):
+        response = client.get('/books/1/chapters')
+        assert len(response.json['data']) == 20
+        assert response.json['links']['last'] == (
+            'http://example.com/books/1/chapters?'
+            'page%5Bnumber%5D=2&page%5Bsize%5D=20'
+        )
+        count_threads = [
+            thread for thread, query in queries if 'count(' in query
+        ]
+        assert count_threads
+        assert threading.current_thread() not in count_threads
+
+    def test_counts_in_request_thread_without_scoped_session(
+        self, client, db, fantasy_database, resource_registry, queries,
+        monkeypatch
+    ):
+        store = resource_registry.by_type['books'].store
+        monkeypatch.setattr(store, 'session', db.session())
+        response = client.get('/books?page%5Bnumber%5D=3&page%5Bsize%5D=5')
+        assert response.json['links']['last'] == (
+            'http://example.com/books?page%5Bnumber%5D=3&page%5Bsize%5D=5'
+        )
+        count_threads = [
+            thread for thread, query in queries if 'count(' in query
+        ]
+        assert count_threads == [threading.current_thread()]
+
+
+class TestPostgreSQLQueryCache(object):
+    @pytest.fixture
+    def controller_class(self):
+        return 'flask_jsonapi.controllers.postgresql.PostgreSQLController'
+
+    @pytest.fixture
+    def controller_options(self):
+        return {'statement_cache_size': 100}
+
+    def test_reuses_query_builder(self, jsonapi):
+        controller = jsonapi.controller
+        assert controller.query_builder is controller.query_builder
+
+    def test_rebuilds_query_builder_after_registration(
+        self, jsonapi, db, models
+    ):
+        controller = jsonapi.controller
+        query_builder = controller.query_builder
+        jsonapi.resources.by_model_class.clear()
+        jsonapi.resources.by_type.clear()
+        jsonapi.resources.register(
+            Resource(
+                type='books',
+                model_class=models.Book,
+                store=SQLAlchemyStore(db.session),
+                fields=[Attribute('title')]
+            )
+        )
+        assert controller.query_builder is not query_builder
+
+    def test_reuses_statement_for_same_shape(
+        self, jsonapi, client, fantasy_database
+    ):
+        first = client.get('/books?include=author&page%5Bnumber%5D=1')
+        second = client.get('/books?include=author&page%5Bnumber%5D=2')
+        assert len(jsonapi.controller._statements) == 1
+        assert len(first.json['data']) == 11
+        assert second.json['data'] == []
+
+    def test_statement_parameters_are_not_cached(
+        self, client, fantasy_database
+    ):
+        client.get('/books/1')
+        response = client.get('/books/2')
+        assert response.json['data']['id'] == '2'
+        assert response.json['links']['self'] == (
+            'http://example.com/books/2'
+        )
+
+    def test_does_not_cache_statements_by_default(self, jsonapi):
+        controller = PostgreSQLController(jsonapi.resources)
+        first = controller._get_statement('foo', lambda builder: object())
+        second = controller._get_statement('foo', lambda builder: object())
+        assert first is not second
+        assert len(controller._statements) == 0
+
+
+class TestStreaming(object):
+    @pytest.fixture
+    def controller_class(self):
+        return 'flask_jsonapi.controllers.default.DefaultController'
+
+    @pytest.fixture
+    def controller_options(self):
+        return {'streaming': True, 'batch_size': 2}
+
+    @pytest.fixture
+    def response(self, client, fantasy_database):
+        return client.get('/books?include=author&page%5Bsize%5D=5')
+
+    def test_responds_with_200_status_code(self, response):
+        assert response.status_code == 200
+
+    def test_responds_with_a_streamed_body(self, response):
+        assert response.is_streamed
+
+    def test_returns_an_array_of_resource_objects(self, response):
+        data = response.json['data']
+        assert [book['id'] for book in data] == ['1', '2', '3', '4', '5']
+
+    def test_returns_requested_related_resources(self, response):
+        included = response.json['included']
+        assert [author['id'] for author in included] == ['1', '2']
+
+    def test_response_contains_pagination_links(self, response):
+        next_link = response.json['links']['next']
+        assert next_link == (
+            'http://example.com/books?include=author&'
+            'page%5Bnumber%5D=2&page%5Bsize%5D=5'
+        )
+
+
+class TestStreamingWithoutIncludes(object):
+    @pytest.fixture
+    def controller_class(self):
+        return 'flask_jsonapi.controllers.default.DefaultController'
+
+    @pytest.fixture
+    def controller_options(self):
+        return {'streaming': True, 'batch_size': 2}
+
+    @pytest.fixture
+    def response(self, client, fantasy_database):
+        return client.get('/books')
+
+    def test_returns_an_array_of_resource_objects(self, response):
+        assert len(response.json['data']) == 11
+
+    def test_does_not_return_included_member(self, response):
+        assert 'included' not in response.json
+
+
 class TestResourceTypeNotFound(object):
     @pytest.fixture
     def response(self, client):
@@ -25,6 +25,9 @@ class TestFetchOne(object):
         self_link = response.json['links']['self']
         assert self_link == 'http://example.com/books/1'
 
+    def test_response_contains_content_length(self, response):
+        assert response.content_length == len(response.data)
+
 
 class TestResourceNotFound(object):
     @pytest.fixture
@@ -1,4 +1,7 @@
 import pytest
+import sqlalchemy
+
+from flask_jsonapi.paginator import CursorPaginator
 
 
 @pytest.fixture(params=[
@@ -55,6 +58,74 @@ class TestFetchRelatedToManyRelation(object):
         assert self_link == 'http://example.com/books/1/chapters'
 
 
+class TestPostgreSQLFetchRelatedRoundTrips(object):
+    @pytest.fixture
+    def controller_class(self):
+        return 'flask_jsonapi.controllers.postgresql.PostgreSQLController'
+
+    @pytest.fixture
+    def queries(self, db):
+        queries = []
+        sqlalchemy.event.listen(
+            db.engine,
+            'before_cursor_execute',
+            lambda *args: queries.append(args[2])
+        )
+        return queries
+
+    def test_to_many_relation_takes_one_query(
+        self, client, fantasy_database, queries
+    ):
+        response = client.get('/books/1/chapters?page%5Bsize%5D=5')
+        assert len(queries) == 1
+        assert len(response.json['data']) == 5
+        assert response.json['links']['last'] == (
+            'http://example.com/books/1/chapters?page%5Bnumber%5D=5&'
+            'page%5Bsize%5D=5'
+        )
+
+    def test_to_one_relation_takes_one_query(
+        self, client, fantasy_database, queries
+    ):
+        response = client.get('/books/1/author')
+        assert len(queries) == 1
+        assert response.json['data']['id'] == '1'
+
+    def test_missing_parent_takes_one_query(
+        self, client, fantasy_database, queries
+    ):
+        response = client.get('/books/123123/chapters')
+        assert len(queries) == 1
+        assert response.status_code == 404
+
+
+class TestStreamingToManyRelation(object):
+    @pytest.fixture
+    def controller_class(self):
+        return 'flask_jsonapi.controllers.default.DefaultController'
+
+    @pytest.fixture
+    def controller_options(self):
+        return {'streaming': True}
+
+    @pytest.fixture
+    def response(self, client, fantasy_database):
+        return client.get('/books/1/chapters')
+
+    def test_responds_with_200_status_code(self, app, response):
+        assert response.status_code == 200
+
+    def test_returns_requested_related_resources(self, response):
+        assert len(response.json['data']) == 20
+
+    def test_response_contains_next_link(self, response):
+        next_link = response.json['links']['next']
+        assert next_link == (
+            'http://example.com/books/1/chapters?'
+            'page%5Bnumber%5D=2&page%5Bsize%5D=20'
+        )
+
+
 class TestFetchRelatedEmptyToManyRelation(object):
     @pytest.fixture
     def response(self, client, fantasy_database):
@@ -185,6 +256,31 @@ class TestToManyRelationPagination(object):
         )
 
 
+class TestToManyRelationCursorPagination(object):
+    @pytest.fixture
+    def response(self, client, fantasy_database, resource_registry):
+        resource_registry.by_type['chapters'].paginator = CursorPaginator(
+            default_page_size=5
+        )
+        return client.get('/books/1/chapters')
+
+    def test_returns_one_page_of_related_resources(self, response):
+        data = response.json['data']
+        assert [chapter['id'] for chapter in data] == [
+            '1', '2', '3', '4', '5'
+        ]
+
+    def test_response_does_not_contain_prev_link(self, response):
+        assert response.json['links']['prev'] is None
+
+    def test_follows_next_link(self, client, response):
+        next_response = client.get(response.json['links']['next'])
+        data = next_response.json['data']
+        assert [chapter['id'] for chapter in data] == [
+            '6', '7', '8', '9', '10'
+        ]
+
+
 class TestResourceTypeNotFound(object):
     @pytest.fixture
     def response(self, client):
@@ -1,5 +1,15 @@
 import pytest
 
+from flask_jsonapi.paginator import CursorPaginator
+
+
+@pytest.fixture(params=[
+    'flask_jsonapi.controllers.default.DefaultController',
+    'flask_jsonapi.controllers.postgresql.PostgreSQLController',
+])
+def controller_class(request):
+    return request.param
+
 
 class TestFetchToOneRelationship(object):
     @pytest.fixture
@@ -91,6 +101,31 @@ class TestFetchEmptyToManyRelationship(object):
         assert response.json['data'] == []
 
 
+class TestToManyRelationshipCursorPagination(object):
+    @pytest.fixture
+    def response(self, client, fantasy_database, resource_registry):
+        resource_registry.by_type['chapters'].paginator = CursorPaginator(
+            default_page_size=5
+        )
+        return client.get('/books/1/relationships/chapters')
+
+    def test_returns_one_page_of_related_resources(self, response):
+        data = response.json['data']
+        assert [chapter['id'] for chapter in data] == [
+            '1', '2', '3', '4', '5'
+        ]
+
+    def test_response_does_not_contain_prev_link(self, response):
+        assert response.json['links']['prev'] is None
+
+    def test_follows_next_link(self, client, response):
+        next_response = client.get(response.json['links']['next'])
+        data = next_response.json['data']
+        assert [chapter['id'] for chapter in data] == [
+            '6', '7', '8', '9', '10'
+        ]
+
+
 class TestResourceTypeNotFound(object):
     @pytest.fixture
     def response(self, client, fantasy_database):
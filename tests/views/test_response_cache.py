@@ -0,0 +1,149 @@
+import json
+
+import pytest
+import sqlalchemy
+
+from flask_jsonapi.cache import LocalCache, ResponseCache
+
+
+@pytest.fixture(params=[
+    'flask_jsonapi.controllers.default.DefaultController',
+    'flask_jsonapi.controllers.postgresql.PostgreSQLController',
+])
+def controller_class(request):
+    return request.param
+
+
+@pytest.fixture
+def controller_options():
+    return {'response_cache': ResponseCache(LocalCache(max_bytes=10 ** 6))}
+
+
+@pytest.fixture
+def queries(db):
+    queries = []
+    sqlalchemy.event.listen(
+        db.engine,
+        'before_cursor_execute',
+        lambda *args: queries.append(args[2])
+    )
+    return queries
+
+
+class TestResponseCache(object):
+    @pytest.mark.parametrize('url', [
+        '/books?include=author',
+        '/books/1',
+        '/books/1/chapters',
+        '/books/1/relationships/stores',
+    ])
+    def test_serves_identical_request_from_cache(
+        self, client, fantasy_database, queries, url
+    ):
+        first = client.get(url)
+        del queries[:]
+        second = client.get(url)
+        assert queries == []
+        assert second.status_code == 200
+        assert second.data == first.data
+        assert second.mimetype == 'application/vnd.api+json'
+
+    def test_does_not_cache_errors(self, client, fantasy_database, queries):
+        client.get('/books/123123')
+        del queries[:]
+        response = client.get('/books/123123')
+        assert response.status_code == 404
+        assert queries
+
+    def test_update_evicts_documents_containing_resource(
+        self, client, fantasy_database
+    ):
+        client.get('/books?include=author')
+        client.patch(
+            '/authors/1',
+            data=json.dumps({
+                'data': {
+                    'type': 'authors',
+                    'id': '1',
+                    'attributes': {'name': 'Foo'}
+                }
+            })
+        )
+        response = client.get('/books?include=author')
+        names = [
+            author['attributes']['name']
+            for author in response.json['included']
+        ]
+        assert 'Foo' in names
+
+    def test_create_evicts_collection(self, client, fantasy_database):
+        client.get('/series')
+        client.post(
+            '/series',
+            data=json.dumps({
+                'data': {'type': 'series', 'attributes': {'title': 'Foo'}}
+            })
+        )
+        response = client.get('/series')
+        assert len(response.json['data']) == 3
+
+    def test_create_evicts_related_parent(self, client, fantasy_database):
+        client.get('/books/1/chapters?page%5Bsize%5D=100')
+        client.post(
+            '/chapters',
+            data=json.dumps({
+                'data': {
+                    'type': 'chapters',
+                    'attributes': {'title': 'Foo', 'ordering': 99},
+                    'relationships': {
+                        'book': {'data': {'type': 'books', 'id': '1'}}
+                    }
+                }
+            })
+        )
+        response = client.get('/books/1/chapters?page%5Bsize%5D=100')
+        assert len(response.json['data']) == 23
+
+    def test_relationship_change_evicts_previous_parent(
+        self, client, fantasy_database
+    ):
+        client.get('/books/1')
+        client.patch(
+            '/chapters/1',
+            data=json.dumps({
+                'data': {
+                    'type': 'chapters',
+                    'id': '1',
+                    'relationships': {
+                        'book': {'data': {'type': 'books', 'id': '2'}}
+                    }
+                }
+            })
+        )
+        response = client.get('/books/1')
+        chapters = response.json['data']['relationships']['chapters']['data']
+        assert {'type': 'chapters', 'id': '1'} not in chapters
+
+    def test_delete_evicts_collection(self, client, fantasy_database):
+        client.get('/books')
+        client.delete('/books/1')
+        response = client.get('/books')
+        assert len(response.json['data']) == 10
+
+    def test_write_before_any_cached_read_evicts_shared_documents(
+        self, client, fantasy_database, controller_options
+    ):
+        # A document stored in the shared backend by another process.
+        cache = controller_options['response_cache']
+        cache.set('foo', 200, b'{}', {'authors:1'}, cache.get_epoch())
+        client.patch(
+            '/authors/1',
+            data=json.dumps({
+                'data': {
+                    'type': 'authors',
+                    'id': '1',
+                    'attributes': {'name': 'Foo'}
+                }
+            })
+        )
+        assert cache.get('foo') is None
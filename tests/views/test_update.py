@@ -3,6 +3,14 @@ import json
 import pytest
 
 
+@pytest.fixture(params=[
+    'flask_jsonapi.controllers.default.DefaultController',
+    'flask_jsonapi.controllers.postgresql.PostgreSQLController',
+])
+def controller_class(request):
+    return request.param
+
+
 class TestUpdateAttributes(object):
     @pytest.fixture
     def update_response(self, client, fantasy_database):